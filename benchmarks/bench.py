@@ -0,0 +1,247 @@
+"""Benchmarks for the WTGUI data model, calculation engine and views
+
+Generates synthetic WTGUI-format CSV files of increasing size and times
+reads, single-row gets, appends, edits, calculation throughput and
+PipelineList population. The views are timed under a virtual framebuffer
+(Xvfb) when no display is available, and skipped if neither is.
+
+Results are written as JSON, and can be compared against a stored
+baseline:
+
+    python benchmarks/bench.py --output bench.json
+    python benchmarks/bench.py --baseline bench.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wtgui.models import CSVModel  # noqa: E402
+from wtgui import pd8010  # noqa: E402
+
+
+def generate_csv(filename, rows, seed=0):
+    """Write a WTGUI-format CSV file of random pipelines"""
+
+    rng = random.Random(seed)
+    projects = [f'Project {i}' for i in range(50)]
+    people = ['ABC', 'DEF', 'GHI', 'JKL', 'MNO', 'PQR']
+    start = date(2018, 1, 1)
+    with open(filename, 'w', newline='') as fh:
+        csvwriter = csv.DictWriter(fh, fieldnames=CSVModel.fields.keys())
+        csvwriter.writeheader()
+        for rownum in range(rows):
+            day = (start + timedelta(days=rownum % 1000)).isoformat()
+            csvwriter.writerow({
+                'Project': rng.choice(projects),
+                'Pipeline': f'PL{rownum:07d}',
+                'Originator': rng.choice(people),
+                'Date': day,
+                'Checker': rng.choice(people),
+                'CheckDate': day,
+                'D_o': round(rng.uniform(100, 1000), 2),
+                't_sel': round(rng.uniform(5, 50), 2),
+                't_cor': rng.choice([0, 1.5, 3]),
+                'tol': 12.5,
+                'B': rng.choice(['', 5]),
+                'SMYS': rng.choice([245, 360, 415, 450, 485, 555]),
+                'E': 207,
+                'v': 0.3
+            })
+
+
+def timed(func, repeat=1):
+    """Get the best wall clock time of func() over repeat runs"""
+
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def clean_sidecars(filename):
+    for suffix in ('.idx', '.journal', '.lock'):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+
+
+def bench_model(filename, rows, repeat):
+    """Time the CSVModel operations on a file of the given size"""
+
+    results = {}
+    clean_sidecars(filename)
+
+    results['read_all'] = timed(
+        lambda: CSVModel(filename).get_all_pipelines(), repeat)
+    results['read_table'] = timed(
+        lambda: CSVModel(filename).get_table(), repeat)
+
+    clean_sidecars(filename)
+    results['get_row_cold'] = timed(
+        lambda: CSVModel(filename).get_pipeline(rows // 2))
+    results['get_row'] = timed(
+        lambda: CSVModel(filename).get_pipeline(rows - 1), repeat)
+
+    model = CSVModel(filename)
+    model.get_all_pipelines()
+    data = model.get_pipeline(0)
+    results['append'] = timed(lambda: model.save_pipeline(data), repeat)
+    results['edit'] = timed(
+        lambda: model.save_pipeline(data, rows // 2), repeat)
+    results['read_all_cached'] = timed(model.get_all_pipelines, repeat)
+    results['compact'] = timed(model.compact)
+
+    return results
+
+
+def bench_calc(filename, repeat):
+    """Time the vectorized calculation over every row in the file"""
+
+    pipelines = CSVModel(filename).get_all_pipelines()
+    table = {
+        key: [pipeline[key] for pipeline in pipelines]
+        for key in ('D_o', 'SMYS', 't_cor', 'tol', 'B', 't_sel')
+    }
+    elapsed = timed(lambda: pd8010.calc_wallthick_table(table, 10), repeat)
+    return {
+        'calc': elapsed,
+        'calc_rows_per_s': len(pipelines) / elapsed if elapsed else 0.
+    }
+
+
+def start_display(display=':99'):
+    """Start Xvfb if there's no display, returning the process or None"""
+
+    if os.environ.get('DISPLAY'):
+        return None
+    xvfb = shutil.which('Xvfb')
+    if not xvfb:
+        return None
+    process = subprocess.Popen(
+        [xvfb, display, '-screen', '0', '1280x1024x24'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    os.environ['DISPLAY'] = display
+    time.sleep(1)
+    return process
+
+
+def bench_views(filename, repeat):
+    """Time populating and refreshing the PipelineList"""
+
+    import tkinter as tk
+    from wtgui.views import PipelineList
+
+    model = CSVModel(filename)
+    rows = model.get_all_pipelines()
+
+    root = tk.Tk()
+    pipelinelist = PipelineList(root, {'on_open_pipeline': print})
+    pipelinelist.grid(sticky='NSEW')
+
+    def populate():
+        pipelinelist.populate(rows)
+        root.update()
+
+    def refresh():
+        model.save_pipeline(rows[0])
+        pipelinelist.refresh(model.get_all_pipelines())
+        root.update()
+
+    results = {
+        'populate': timed(populate, repeat),
+        'refresh_after_append': timed(refresh, repeat)
+    }
+    root.destroy()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each result against the baseline, returning the regressions"""
+
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if not old or name.startswith('calc_rows_per_s'):
+            print(f'{name:32} {value:12.6f}')
+            continue
+        ratio = value / old
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:32} {value:12.6f} {old:12.6f} {ratio:6.2f}x{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 100000, 1000000],
+                        help='rows per generated file (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per timing, best is kept')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    parser.add_argument('--no-views', action='store_true',
+                        help='skip the Tk view benchmarks')
+    args = parser.parse_args(argv)
+
+    xvfb = None if args.no_views else start_display()
+    views = not args.no_views and bool(os.environ.get('DISPLAY'))
+    if not args.no_views and not views:
+        print('No display or Xvfb available, skipping views',
+              file=sys.stderr)
+
+    results = {}
+    tempdir = tempfile.mkdtemp(prefix='wtgui-bench-')
+    try:
+        for size in args.sizes:
+            filename = os.path.join(tempdir, f'wt_data_{size}.csv')
+            generate_csv(filename, size)
+            timings = bench_model(filename, size, args.repeat)
+            timings.update(bench_calc(filename, args.repeat))
+            if views:
+                timings.update(bench_views(filename, args.repeat))
+            for name, value in timings.items():
+                results[f'{name}@{size}'] = value
+    finally:
+        shutil.rmtree(tempdir)
+        if xvfb:
+            xvfb.terminate()
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(json.dumps(report, indent=2))
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as fh:
+            baseline = json.loads(fh.read())['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,108 @@
-from wtgui.application import Application
+import argparse
+import sys
+import time
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='wt',
+        description='Subsea pipeline wall thickness calculations'
+    )
+    parser.add_argument(
+        '--profile-startup', action='store_true',
+        help='report the time taken by each phase of startup, then exit'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser(
+        'batch',
+        help='run calculations headless over WTGUI-format CSV files'
+    )
+    batch.add_argument('files', nargs='+', help='input CSV files')
+    batch.add_argument('-o', '--output', required=True,
+                       help="output CSV file, or '-' for stdout")
+    batch.add_argument('-p', '--pressure', type=float, required=True,
+                       help='design pressure, in units consistent with SMYS')
+    batch.add_argument('-c', '--chunksize', type=int, default=10000,
+                       help='rows per chunk (default: %(default)s)')
+    batch.add_argument('-j', '--workers', type=int, default=None,
+                       help='worker processes (default: number of cores)')
+
+    validate = subparsers.add_parser(
+        'validate',
+        help='check every value in WTGUI-format CSV files'
+    )
+    validate.add_argument('files', nargs='+', help='input CSV files')
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == 'batch':
+        # imported here so the batch mode never needs a display
+        from wtgui.batch import run_batch
+
+        try:
+            count = run_batch(args.files, args.output, args.pressure,
+                              chunksize=args.chunksize,
+                              workers=args.workers)
+        except FileNotFoundError as e:
+            sys.exit(f'{e.strerror}: {e.filename}')
+        print(f'{count} rows calculated', file=sys.stderr)
+        return
+
+    if args.command == 'validate':
+        from wtgui.models import CSVModel
+        from wtgui.validation import run_validate
+
+        count = run_validate(args.files, CSVModel.fields)
+        print(f'{count} invalid values', file=sys.stderr)
+        sys.exit(1 if count else 0)
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    from wtgui.application import Application
+
     app = Application()
     app.mainloop()
 
 
+def profile_startup():
+    """Start the application, reporting how long each phase takes
+
+    The phases are importing the application, building and drawing the
+    window, and loading the pipelines into the list.
+    """
+
+    start = time.perf_counter()
+    from wtgui.application import Application
+    imported = time.perf_counter()
+
+    app = Application()
+    app.update()
+    built = time.perf_counter()
+
+    # the pipelines load on the worker thread once the window is drawn
+    while app.tasks.busy:
+        app.update()
+        time.sleep(0.01)
+    app.update()
+    loaded = time.perf_counter()
+    app.on_quit()
+
+    phases = [
+        ('import', imported - start),
+        ('build', built - imported),
+        ('data load', loaded - built),
+        ('total', loaded - start)
+    ]
+    for name, seconds in phases:
+        print(f'{name:10} {seconds:8.3f}s', file=sys.stderr)
+
+
 if __name__ == '__main__':
     main()
@@ -9,6 +9,9 @@ setup(
     author_email='ben.m.randerson@gmail.com',
     license='MIT',
     packages=find_packages(exclude=('tests',)),
+    install_requires=[
+        'numpy'
+    ],
     entry_points={
         'console_scripts': [
             'wt=run:main'
@@ -0,0 +1,52 @@
+import csv
+
+import pytest
+
+from wtgui import batch, pd8010
+
+from .test_models import make_pipeline, write_csv
+
+
+def make_inputs(tmp_path, files, rows):
+    filenames = []
+    for f in range(files):
+        pipelines = []
+        for i in range(rows):
+            rownum = f * rows + i
+            pipeline = make_pipeline(rownum)
+            pipeline['D_o'] = f'{100 + rownum}'
+            pipelines.append(pipeline)
+        filename = str(tmp_path / f'in{f}.csv')
+        write_csv(filename, pipelines)
+        filenames.append(filename)
+    return filenames
+
+
+def test_run_batch(tmp_path):
+    filenames = make_inputs(tmp_path, 3, 25)
+    output = str(tmp_path / 'out.csv')
+    count = batch.run_batch(filenames, output, 10, chunksize=4, workers=3)
+    assert count == 75
+
+    with open(output, newline='') as fh:
+        rows = list(csv.DictReader(fh))
+    assert [row['Pipeline'] for row in rows] == [
+        f'PL{rownum:03d}' for rownum in range(75)]
+    for rownum, row in enumerate(rows):
+        t_req, util = pd8010.calc_wallthick_array(
+            100 + rownum, 10, 450, t_cor=3, tol=12.5, t_sel=12.7)
+        assert row['D_o'] == f'{100 + rownum}'
+        assert row['t_req'] == batch.format_result(float(t_req))
+        assert row['util'] == batch.format_result(float(util))
+
+
+def test_run_batch_missing_input(tmp_path):
+    filenames = make_inputs(tmp_path, 1, 2)
+    missing = str(tmp_path / 'missing.csv')
+    output = tmp_path / 'out.csv'
+    with pytest.raises(FileNotFoundError) as excinfo:
+        batch.run_batch(filenames + [missing], str(output), 10, workers=2)
+    assert excinfo.value.filename == missing
+    assert not output.exists()
+    with pytest.raises(FileNotFoundError):
+        list(batch.read_chunks([missing], 10))
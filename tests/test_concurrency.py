@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import random
+
+import pytest
+
+from wtgui import models
+from wtgui.models import ConflictError, CSVModel
+
+from .test_models import make_pipeline
+
+pytestmark = pytest.mark.skipif(models.fcntl is None,
+                                reason='advisory locks need fcntl')
+
+WRITERS = 8
+ROWS = 60
+
+
+def writer(filename, number, journal_limit):
+    """Append rows and edit random ones, compacting often"""
+
+    CSVModel.journal_limit = journal_limit
+    model = CSVModel(filename)
+    rng = random.Random(number)
+    for rownum in range(ROWS):
+        model.save_pipeline(
+            dict(make_pipeline(rownum), Pipeline=f'W{number}-{rownum}'))
+        if rownum % 3 == 0:
+            count = len(CSVModel(filename).get_all_pipelines())
+            edit = rng.randrange(count)
+            pipeline = model.get_pipeline(edit)
+            try:
+                model.save_pipeline(dict(pipeline, Checker=f'E{number}'),
+                                    edit, expected=pipeline)
+            except ConflictError:
+                pass
+
+
+def test_concurrent_writers(tmp_path):
+    filename = str(tmp_path / 'shared.csv')
+    processes = [
+        multiprocessing.Process(target=writer, args=(filename, number, 20))
+        for number in range(WRITERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * WRITERS
+
+    pipelines = CSVModel(filename).get_all_pipelines()
+    names = sorted(pipeline['Pipeline'] for pipeline in pipelines)
+    assert names == sorted(
+        f'W{number}-{rownum}'
+        for number in range(WRITERS) for rownum in range(ROWS))
+    for pipeline in pipelines:
+        assert None not in pipeline.values()
+        assert pipeline['v'] == '0.3'
+
+    # the shared index still matches the file
+    model = CSVModel(filename)
+    for rownum in (0, len(pipelines) // 2, len(pipelines) - 1):
+        assert model.get_pipeline(rownum) == pipelines[rownum]
+
+
+def test_conflicting_edit(tmp_path):
+    filename = str(tmp_path / 'shared.csv')
+    CSVModel(filename).save_pipeline(make_pipeline(0))
+    first, second = CSVModel(filename), CSVModel(filename)
+    opened = first.get_pipeline(0)
+    assert second.get_pipeline(0) == opened
+
+    first.save_pipeline(dict(opened, Checker='GHI'), 0, expected=opened)
+    with pytest.raises(ConflictError):
+        second.save_pipeline(dict(opened, Checker='JKL'), 0,
+                             expected=opened)
+    assert CSVModel(filename).get_pipeline(0)['Checker'] == 'GHI'
+
+    # an edit of the row as it is now goes through
+    second.save_pipeline(dict(opened, Checker='JKL'), 0,
+                         expected=second.get_pipeline(0))
+    assert CSVModel(filename).get_pipeline(0)['Checker'] == 'JKL'
+
+
+def test_lock_timeout(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'shared.csv')
+    holder = CSVModel(filename)
+    monkeypatch.setattr(CSVModel, 'lock_timeout', .2)
+    with holder._locked():
+        with pytest.raises(TimeoutError):
+            CSVModel(filename).save_pipeline(make_pipeline(0))
+    CSVModel(filename).save_pipeline(make_pipeline(0))
+    assert not os.path.exists(filename + '.journal')
+    assert len(CSVModel(filename).get_all_pipelines()) == 1
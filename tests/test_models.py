@@ -0,0 +1,397 @@
+import copy
+import csv
+import json
+import os
+from array import array
+
+import pytest
+
+from wtgui import batch, models
+from wtgui.models import CSVModel, SQLiteModel
+from wtgui.validation import Validator
+
+
+def make_pipeline(rownum):
+    return {
+        'Project': 'North Sea',
+        'Pipeline': f'PL{rownum:03d}',
+        'Originator': 'ABC',
+        'Date': '2018-09-25',
+        'Checker': 'DEF',
+        'CheckDate': '2018-09-26',
+        'D_o': '273.1',
+        't_sel': '12.7',
+        't_cor': '3',
+        'tol': '12.5',
+        'B': '',
+        'SMYS': '450',
+        'E': '207',
+        'v': '0.3'
+    }
+
+
+def write_csv(filename, pipelines):
+    with open(filename, 'w', newline='') as fh:
+        csvwriter = csv.DictWriter(fh, fieldnames=CSVModel.fields.keys())
+        csvwriter.writeheader()
+        csvwriter.writerows(pipelines)
+
+
+@pytest.fixture
+def blank_lines(tmp_path):
+    """A file with a blank line between rows, a short row and a trailing
+    blank line"""
+
+    filename = str(tmp_path / 'blank.csv')
+    write_csv(filename, [make_pipeline(0)])
+    with open(filename, 'a', newline='') as fh:
+        fh.write('\r\n')
+        csv.writer(fh).writerow(make_pipeline(1).values())
+        csv.writer(fh).writerow(list(make_pipeline(2).values())[:-2])
+        fh.write('\r\n')
+    return filename
+
+
+def test_blank_lines_skipped(blank_lines):
+    model = CSVModel(blank_lines)
+    names = ['PL000', 'PL001', 'PL002']
+    assert [row['Pipeline'] for row in model.get_all_pipelines()] == names
+    assert [row['Pipeline'] for row in CSVModel(blank_lines).get_table()] \
+        == names
+    pipelines = list(CSVModel(blank_lines).iter_pipelines(typed=False))
+    assert [row['Pipeline'] for row in pipelines] == names
+    assert CSVModel(blank_lines).get_pipeline(1)['Pipeline'] == 'PL001'
+
+
+def test_short_rows_padded(blank_lines):
+    pipelines = list(CSVModel(blank_lines).iter_pipelines())
+    assert pipelines[2]['E'] is None
+    assert pipelines[2]['v'] is None
+    table = CSVModel(blank_lines).get_table()
+    assert table[2]['v'] == ''
+
+
+def test_blank_lines_with_journal(blank_lines):
+    model = CSVModel(blank_lines)
+    model.save_pipeline(dict(make_pipeline(1), Checker='GHI'), 1)
+    pipelines = list(CSVModel(blank_lines).iter_pipelines(typed=False))
+    assert pipelines[1]['Checker'] == 'GHI'
+    assert pipelines[2]['Pipeline'] == 'PL002'
+
+
+def test_batch_blank_lines(blank_lines):
+    chunks = list(batch.read_chunks([blank_lines], 2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+def append_csv(filename, pipelines):
+    with open(filename, 'a', newline='') as fh:
+        csvwriter = csv.DictWriter(fh, fieldnames=CSVModel.fields.keys())
+        csvwriter.writerows(pipelines)
+
+
+def read_index(model):
+    with open(model.index_filename, 'rb') as fh:
+        header = json.loads(fh.read(model.index_header_size))
+        offsets = array('q')
+        offsets.frombytes(fh.read())
+    return header, offsets
+
+
+def test_tail(tmp_path):
+    filename = str(tmp_path / 'tail.csv')
+    write_csv(filename, [make_pipeline(rownum) for rownum in range(3)])
+    model = CSVModel(filename)
+    model.get_table()
+    model.get_pipeline(0)
+    assert model.tail_pending()
+    assert model.tail() == []
+    assert not model.tail_pending()
+
+    append_csv(filename, [make_pipeline(3), make_pipeline(4)])
+    assert model.tail_pending()
+    rows = model.tail()
+    assert [row['Pipeline'] for row in rows] == ['PL003', 'PL004']
+    assert len(model.get_table()) == 5
+    assert not model.tail_pending()
+
+    # the sidecar was extended to match the file
+    header, offsets = read_index(model)
+    assert header['signature'] == model._signature()
+    rebuilt = CSVModel(filename)
+    rebuilt._build_index()
+    assert list(offsets) == list(rebuilt._offsets)
+    assert CSVModel(filename).get_pipeline(4)['Pipeline'] == 'PL004'
+
+
+def test_tail_partial_row(tmp_path):
+    filename = str(tmp_path / 'tail.csv')
+    write_csv(filename, [make_pipeline(0)])
+    model = CSVModel(filename)
+    model.get_table()
+    model.tail()
+    with open(filename, 'a', newline='') as fh:
+        fh.write('North Sea,PL001,')
+    assert model.tail() == []
+    with open(filename, 'a', newline='') as fh:
+        fh.write(','.join(list(make_pipeline(1).values())[2:]) + '\r\n')
+    assert [row['Pipeline'] for row in model.tail()] == ['PL001']
+
+
+def test_tail_rewrite(tmp_path):
+    filename = str(tmp_path / 'tail.csv')
+    write_csv(filename, [make_pipeline(rownum) for rownum in range(3)])
+    model = CSVModel(filename)
+    model.get_table()
+    model.tail()
+    write_csv(filename, [make_pipeline(rownum) for rownum in range(2)])
+    assert model.tail() is None
+    # only reported once
+    assert not model.tail_pending()
+    assert model.tail() == []
+    assert len(model.get_table()) == 2
+
+
+def test_save_new_file(tmp_path):
+    filename = str(tmp_path / 'new.csv')
+    model = CSVModel(filename)
+    assert model.get_all_pipelines() == []
+    model.save_pipeline(make_pipeline(0))
+    model.save_pipeline(make_pipeline(1))
+    assert model.get_all_pipelines() == [make_pipeline(0), make_pipeline(1)]
+    assert CSVModel(filename).get_all_pipelines() == \
+        [make_pipeline(0), make_pipeline(1)]
+
+
+def test_journal_and_compact(tmp_path):
+    filename = str(tmp_path / 'edits.csv')
+    write_csv(filename, [make_pipeline(rownum) for rownum in range(5)])
+    model = CSVModel(filename)
+    model.get_table()
+    model.save_pipeline(dict(make_pipeline(1), Checker='GHI'), 1)
+    model.save_pipeline(dict(make_pipeline(1), Checker='JKL'), 1)
+    model.save_pipeline(dict(make_pipeline(3), D_o='300'), -2)
+    assert os.path.exists(model.journal_filename)
+
+    expected = [make_pipeline(rownum) for rownum in range(5)]
+    expected[1]['Checker'] = 'JKL'
+    expected[3]['D_o'] = '300'
+    for reader in (model, CSVModel(filename)):
+        assert reader.get_all_pipelines() == expected
+        assert [dict(row) for row in reader.get_table()] == expected
+        assert reader.get_pipeline(1) == expected[1]
+
+    model.compact()
+    assert not os.path.exists(model.journal_filename)
+    assert CSVModel(filename).get_all_pipelines() == expected
+    assert CSVModel(filename).get_pipeline(3) == expected[3]
+
+
+def test_journal_limit_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(CSVModel, 'journal_limit', 3)
+    filename = str(tmp_path / 'edits.csv')
+    write_csv(filename, [make_pipeline(rownum) for rownum in range(2)])
+    model = CSVModel(filename)
+    for checker in ('A', 'B', 'C'):
+        model.save_pipeline(dict(make_pipeline(0), Checker=checker), 0)
+    assert not os.path.exists(model.journal_filename)
+    assert CSVModel(filename).get_pipeline(0)['Checker'] == 'C'
+
+
+def test_index(tmp_path):
+    filename = str(tmp_path / 'index.csv')
+    pipelines = [make_pipeline(rownum) for rownum in range(10)]
+    pipelines[4]['Project'] = 'Spans\r\ntwo lines'
+    write_csv(filename, pipelines)
+    model = CSVModel(filename)
+    assert model.get_pipeline(4) == pipelines[4]
+    assert model.get_pipeline(-1) == pipelines[-1]
+    with pytest.raises(IndexError):
+        model.get_pipeline(10)
+    assert os.path.exists(model.index_filename)
+
+    # appends extend the index, which later models read back
+    model.save_pipeline(make_pipeline(10))
+    header, offsets = read_index(model)
+    assert header['signature'] == model._signature()
+    assert len(offsets) == 11
+    assert CSVModel(filename).get_pipeline(10) == make_pipeline(10)
+
+    # a stale index is rebuilt
+    append_csv(filename, [make_pipeline(11)])
+    assert CSVModel(filename).get_pipeline(11) == make_pipeline(11)
+
+
+@pytest.fixture(params=['.csv.gz', '.csv.xz'])
+def compressed(request, tmp_path):
+    """A compressed copy of a file of 20 pipelines"""
+
+    plain = str(tmp_path / 'plain.csv')
+    write_csv(plain, [make_pipeline(rownum) for rownum in range(20)])
+    filename = str(tmp_path / f'archive{request.param}')
+    module = models.compressors[request.param[-3:]]
+    with open(plain, 'rb') as src, module.open(filename, 'wb') as dst:
+        dst.write(src.read())
+    return filename
+
+
+def test_compressed_read(compressed):
+    expected = [make_pipeline(rownum) for rownum in range(20)]
+    assert CSVModel(compressed).get_all_pipelines() == expected
+    assert [dict(row) for row in CSVModel(compressed).get_table()] == \
+        expected
+    assert len(list(CSVModel(compressed).iter_pipelines())) == 20
+    model = CSVModel(compressed)
+    assert model.get_pipeline(7) == expected[7]
+    assert model.get_pipeline(-1) == expected[-1]
+
+
+def test_compressed_append_and_compact(compressed):
+    model = CSVModel(compressed)
+    model.get_pipeline(0)
+    model.save_pipeline(make_pipeline(20))
+    model.save_pipeline(make_pipeline(21))
+    assert CSVModel(compressed).get_pipeline(21) == make_pipeline(21)
+    assert len(CSVModel(compressed).get_all_pipelines()) == 22
+
+    model.save_pipeline(dict(make_pipeline(3), Checker='GHI'), 3)
+    model.compact()
+    assert not os.path.exists(model.journal_filename)
+    pipelines = CSVModel(compressed).get_all_pipelines()
+    assert len(pipelines) == 22
+    assert pipelines[3]['Checker'] == 'GHI'
+
+    # the file is still a single valid compressed CSV
+    module = models.compressors[compressed[-3:]]
+    with module.open(compressed, 'rt', newline='') as fh:
+        assert len(list(csv.DictReader(fh))) == 22
+
+
+def test_compressed_validate_and_import(compressed, tmp_path):
+    assert list(Validator(CSVModel.fields).validate_file(compressed)) == []
+    database = SQLiteModel(str(tmp_path / 'archive.db'))
+    assert database.import_csv(compressed) == 20
+    assert database.get_pipeline(19)['Pipeline'] == 'PL019'
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SQLiteModel(str(tmp_path / 'pipelines.db'))
+    for rownum in range(5):
+        pipeline = make_pipeline(rownum)
+        pipeline['Project'] = 'North Sea' if rownum % 2 else 'Irish Sea'
+        database.save_pipeline(pipeline)
+    return database
+
+
+def test_sqlite_save_edit(database):
+    pipeline = make_pipeline(10)
+    database.save_pipeline(pipeline, 2)
+    assert database.count() == 5
+    assert database.get_pipeline(2)['Pipeline'] == 'PL010'
+    assert database.get_pipeline(-1)['Pipeline'] == 'PL004'
+    database.save_pipeline(make_pipeline(11), -1)
+    assert database.get_pipeline(4)['Pipeline'] == 'PL011'
+
+
+def test_sqlite_bad_rownum(database):
+    for rownum in (5, -6):
+        with pytest.raises(IndexError):
+            database.get_pipeline(rownum)
+        with pytest.raises(IndexError):
+            database.save_pipeline(make_pipeline(0), rownum)
+    assert database.count() == 5
+
+
+def test_sqlite_query(database):
+    rows = database.query()
+    assert [rownum for rownum, pipeline in rows] == list(range(5))
+    page = database.query(offset=1, limit=2)
+    assert [pipeline['Pipeline'] for rownum, pipeline in page] == [
+        'PL001', 'PL002']
+    north = database.query({'Project': 'North Sea'})
+    assert [rownum for rownum, pipeline in north] == [1, 3]
+    assert database.query({'Project': 'North Sea'}, offset=1) == north[1:]
+    with pytest.raises(ValueError):
+        database.query({'Nonsense': 'x'})
+
+
+def test_sqlite_conflicting_edit(database):
+    other = SQLiteModel(database.filename)
+    expected = database.get_pipeline(1)
+
+    # an unchanged row saves as normal
+    edited = dict(expected, Pipeline='PL101')
+    database.save_pipeline(edited, 1, expected=expected)
+    assert other.get_pipeline(1)['Pipeline'] == 'PL101'
+
+    # another connection's edit makes the opened copy stale
+    other.save_pipeline(dict(edited, Pipeline='PL201'), 1)
+    with pytest.raises(models.ConflictError):
+        database.save_pipeline(dict(edited, Pipeline='PL301'), 1,
+                               expected=edited)
+    assert database.get_pipeline(1)['Pipeline'] == 'PL201'
+
+    # the rolled back transaction doesn't hold the write lock
+    other.save_pipeline(make_pipeline(7))
+    assert database.count() == 6
+
+
+def test_sqlite_export_round_trip(database, tmp_path):
+    filename = str(tmp_path / 'export.csv')
+    assert database.export_csv(filename) == 5
+    copy = SQLiteModel(str(tmp_path / 'copy.db'))
+    assert copy.import_csv(filename) == 5
+    assert copy.get_all_pipelines() == database.get_all_pipelines()
+
+    # decimals are stored as REAL, so their text isn't preserved
+    with open(filename, newline='') as fh:
+        row = next(csv.DictReader(fh))
+    assert row['Pipeline'] == 'PL000'
+    assert row['D_o'] == '273.1'
+    assert row['t_cor'] == '3.0'
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    # the variables are a class attribute, so each test gets its own
+    monkeypatch.setattr(models.SettingsModel, 'variables',
+                        copy.deepcopy(models.SettingsModel.variables))
+    return models.SettingsModel(path=str(tmp_path))
+
+
+def test_settings_skip_unchanged(settings):
+    assert settings.save()
+    assert not settings.save()
+    settings.set('record timings', True)
+    assert settings.save()
+    assert not settings.save()
+
+    # loading the saved file counts as unchanged
+    reloaded = models.SettingsModel(path=os.path.dirname(settings.filepath))
+    assert not reloaded.save()
+    assert reloaded.variables['record timings']['value'] is True
+
+
+def test_settings_atomic_replace(settings, monkeypatch):
+    settings.save()
+    os.chmod(settings.filepath, 0o644)
+    settings.set('autofill date', False)
+    assert settings.save()
+    assert os.stat(settings.filepath).st_mode & 0o777 == 0o644
+
+    # a failed write leaves the old file, and no temporary file
+    with open(settings.filepath) as fh:
+        saved = fh.read()
+
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(models.os, 'fsync', fail)
+    settings.set('autofill date', True)
+    with pytest.raises(OSError):
+        settings.save()
+    with open(settings.filepath) as fh:
+        assert fh.read() == saved
+    assert os.listdir(os.path.dirname(settings.filepath)) == [
+        os.path.basename(settings.filepath)]
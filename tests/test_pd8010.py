@@ -0,0 +1,38 @@
+import math
+
+import numpy as np
+import pytest
+
+from wtgui import pd8010
+
+
+def test_calc_wallthick():
+    assert pd8010.calc_wallthick(100, 10, 450) == pytest.approx(
+        10 * 100 / 0.72 / 450)
+
+
+def test_calc_wallthick_invalid():
+    with pytest.raises(ZeroDivisionError):
+        pd8010.calc_wallthick(100, 10, 0)
+    with pytest.raises(ValueError):
+        pd8010.calc_wallthick('', 10, 450)
+
+
+def test_calc_wallthick_array_matches_scalar():
+    d = [100, 250.5, 1000]
+    smys = [245, 450, 555]
+    t_req, util = pd8010.calc_wallthick_array(d, 10, smys, t_sel=[5, 5, 5])
+    for i in range(3):
+        assert t_req[i] == pytest.approx(
+            pd8010.calc_wallthick(d[i], 10, smys[i]))
+    assert util == pytest.approx(t_req / 5)
+
+
+def test_calc_wallthick_array_blank_inputs():
+    with np.errstate(all='raise'):
+        t_req, util = pd8010.calc_wallthick_array(
+            ['', 100, 100, 100], 10, [450, '', 0, 450],
+            t_cor=['', '', '', ''], t_sel=[5, 5, 5, ''])
+    assert all(math.isnan(value) for value in t_req[:3])
+    assert all(math.isnan(value) for value in util)
+    assert t_req[3] == pytest.approx(10 * 100 / 0.72 / 450)
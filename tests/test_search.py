@@ -0,0 +1,78 @@
+from wtgui.search import PrefixIndex, SuggestionIndex
+
+from .test_models import make_pipeline
+
+
+def make_rows():
+    rows = [make_pipeline(rownum) for rownum in range(4)]
+    rows[1]['Project'] = 'Irish Sea'
+    rows[2]['Project'] = 'North Atlantic'
+    rows[3]['Originator'] = 'XYZ'
+    return rows
+
+
+def test_prefix_search():
+    index = PrefixIndex(('Project', 'Pipeline'))
+    index.build(make_rows())
+    assert index.search('') is None
+    assert index.search('nor') == {0, 2, 3}
+    assert index.search('SEA') == {0, 1, 3}
+    assert index.search('north se') == {0, 3}
+    assert index.search('sea north') == {0, 3}
+    assert index.search('pl002') == {2}
+    assert index.search('south') == set()
+
+
+def test_prefix_add_remove():
+    rows = make_rows()
+    index = PrefixIndex(('Project', 'Pipeline'))
+    index.build(rows)
+    edited = dict(rows[0], Project='South Sea')
+    index.remove(0, rows[0])
+    index.add(0, edited)
+    assert index.search('north') == {2, 3}
+    assert index.search('south') == {0}
+    index.add(4, make_pipeline(4))
+    assert index.search('north sea') == {3, 4}
+
+
+def test_suggestions_ranked():
+    suggestions = SuggestionIndex(('Project', 'Originator'))
+    suggestions.build(make_rows())
+    # most used first, then most recently used
+    assert suggestions.suggest('Project', '') == [
+        'North Sea', 'North Atlantic', 'Irish Sea']
+    assert suggestions.suggest('Project', 'n') == [
+        'North Sea', 'North Atlantic']
+    assert suggestions.suggest('Project', 'n', limit=1) == ['North Sea']
+    assert suggestions.suggest('Originator', 'x') == ['XYZ']
+
+    # the ranked scan gives the same order as the bisected one
+    suggestions.scan_limit = 0
+    assert suggestions.suggest('Project', '') == [
+        'North Sea', 'North Atlantic', 'Irish Sea']
+
+
+def test_suggestions_add_remove():
+    rows = make_rows()
+    suggestions = SuggestionIndex(('Project',))
+    suggestions.build(rows)
+    suggestions.add(4, {'Project': 'Irish Sea'})
+    suggestions.add(5, {'Project': 'Irish Sea'})
+    assert suggestions.suggest('Project', '')[0] == 'Irish Sea'
+
+    # an edit away from the only use of a value drops it
+    suggestions.remove(2, rows[2])
+    suggestions.add(2, {'Project': 'Celtic Sea'})
+    assert suggestions.suggest('Project', 'north') == ['North Sea']
+    assert suggestions.suggest('Project', 'c') == ['Celtic Sea']
+
+    # a value still used by another row stays
+    suggestions.remove(0, rows[0])
+    assert suggestions.suggest('Project', 'north') == ['North Sea']
+    suggestions.remove(3, rows[3])
+    assert suggestions.suggest('Project', 'north') == []
+
+    # removing a value that was never added is harmless
+    suggestions.remove(9, {'Project': 'Dogger Bank'})
+    assert suggestions.suggest('Project', 'd') == []
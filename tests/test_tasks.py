@@ -0,0 +1,85 @@
+import threading
+
+from wtgui.tasks import TaskRunner
+
+
+class FakeRoot:
+    """Just enough of a Tk root for TaskRunner, without a display"""
+
+    def after(self, ms, func):
+        return 'after#1'
+
+    def config(self, **kwargs):
+        pass
+
+
+class FakeVar:
+
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def make_runner():
+    return TaskRunner(FakeRoot(), FakeVar())
+
+
+def drain(runner):
+    """Wait for the worker thread, then deliver every outcome"""
+
+    runner.executor.submit(lambda: None).result()
+    runner._poll()
+
+
+def test_cancel_only_loads():
+    runner = make_runner()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def load(progress):
+        started.set()
+        release.wait()
+        for count in range(3):
+            progress(count)
+        return 'loaded'
+
+    runner.submit(load, description='Loading', on_done=results.append,
+                  progress=True)
+    started.wait()
+    runner.submit(lambda: 'saved', description='Saving',
+                  on_done=results.append)
+    runner.submit(lambda progress: 'reloaded', description='Loading',
+                  on_done=results.append, progress=True)
+    runner.cancel()
+    release.set()
+    drain(runner)
+
+    assert results == ['saved']
+    assert not runner.busy
+    assert runner.status.get() == 'Loading cancelled'
+
+
+def test_shutdown_finishes_saves():
+    runner = make_runner()
+    release = threading.Event()
+    saved = []
+
+    def load(progress):
+        release.wait()
+        progress(0)
+
+    def save():
+        saved.append(True)
+
+    runner.submit(load, progress=True)
+    runner.submit(save)
+    # the load is still running when shutdown is called
+    threading.Timer(.1, release.set).start()
+    runner.shutdown()
+    assert saved == [True]
@@ -0,0 +1,52 @@
+from wtgui.constants import FieldTypes as FT
+from wtgui.models import CSVModel
+from wtgui.validation import Validator, compile_bulk, compile_field
+
+from .test_models import make_pipeline, write_csv
+
+
+def test_compile_field():
+    validate = compile_field(CSVModel.fields['D_o'])
+    assert validate('273.1') is None
+    assert validate('') == 'A value is required'
+    assert validate('abc') == 'Invalid number string: abc'
+    assert validate('1.234') == 'Too many decimal places (max 2)'
+
+
+def test_validate_file(tmp_path):
+    filename = str(tmp_path / 'bad.csv')
+    write_csv(filename, [make_pipeline(0), dict(make_pipeline(1), D_o='x')])
+    errors = list(Validator(CSVModel.fields).validate_file(filename))
+    assert errors == [(1, 'D_o', 'x', 'Invalid number string: x')]
+
+
+def test_validate_file_blank_lines(tmp_path):
+    filename = str(tmp_path / 'blank.csv')
+    write_csv(filename, [make_pipeline(0)])
+    with open(filename, 'a', newline='') as fh:
+        fh.write('\r\n')
+    with open(filename, 'a', newline='') as fh:
+        fh.write(','.join(dict(make_pipeline(1), D_o='x').values()) + '\r\n')
+    errors = list(Validator(CSVModel.fields).validate_file(filename))
+    assert errors == [(1, 'D_o', 'x', 'Invalid number string: x')]
+    assert CSVModel(filename).get_pipeline(1)['D_o'] == 'x'
+
+
+def test_bulk_matches_single():
+    values = ['.123', '.12', '.120', '-.5', '1.', '+1', '-0', '1e2', '1e-3',
+              'nan', 'inf', '.', '', ' 1', '1_0', '1.234', '1000.00',
+              '1000.01', '-1']
+    specs = [
+        CSVModel.fields['D_o'],
+        CSVModel.fields['B'],
+        {'type': FT.integer, 'min': -5, 'max': 5000},
+    ]
+    for spec in specs:
+        validate = compile_field(spec)
+        bulk = compile_bulk(spec, validate)
+        # each value alone, so the fast path is tried on every one
+        for value in values:
+            expected = validate(value)
+            assert bulk([value]) == ({value: expected} if expected else {})
+        assert bulk(values) == {
+            value: validate(value) for value in values if validate(value)}
@@ -0,0 +1,96 @@
+import gzip
+import os
+from datetime import date
+
+import pytest
+
+from wtgui import models
+from wtgui.models import WorkspaceModel
+
+from .test_models import append_csv, make_pipeline, write_csv
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """Two days of pipelines, the first archived, and an unrelated CSV"""
+
+    archive = str(tmp_path / 'wt_data_2018-09-24.csv')
+    write_csv(archive, [make_pipeline(rownum) for rownum in range(3)])
+    with open(archive, 'rb') as src, \
+            gzip.open(archive + '.gz', 'wb') as dst:
+        dst.write(src.read())
+    os.remove(archive)
+    write_csv(str(tmp_path / 'wt_data_2018-09-25.csv'),
+              [make_pipeline(rownum) for rownum in range(3, 5)])
+    with open(tmp_path / 'notes.csv', 'w') as fh:
+        fh.write('Name,Note\nPL001,Check the coating\n')
+    return str(tmp_path)
+
+
+def test_workspace_files(workspace):
+    model = WorkspaceModel(workspace)
+    assert [os.path.basename(filename) for filename in model.files()] == [
+        'wt_data_2018-09-24.csv.gz', 'wt_data_2018-09-25.csv']
+    assert model.manifest['notes.csv']['fields'] == ['Name', 'Note']
+
+
+def test_workspace_locate(workspace):
+    model = WorkspaceModel(workspace)
+    expected = [make_pipeline(rownum) for rownum in range(5)]
+    assert [dict(row) for row in model.get_table()] == expected
+    assert model.get_all_pipelines() == expected
+    assert list(model.iter_pipelines(typed=False)) == expected
+    assert model.get_pipeline(2) == expected[2]
+    assert model.get_pipeline(3) == expected[3]
+    assert model.get_pipeline(-1) == expected[4]
+    with pytest.raises(IndexError):
+        model.get_pipeline(5)
+    with pytest.raises(IndexError):
+        model.get_pipeline(-6)
+
+
+def test_workspace_save(workspace):
+    model = WorkspaceModel(workspace)
+    model.save_pipeline(dict(make_pipeline(3), Checker='GHI'), 3)
+    model.save_pipeline(make_pipeline(5))
+
+    today = os.path.join(workspace, f'wt_data_{date.today()}.csv')
+    assert models.CSVModel(today).get_all_pipelines() == [make_pipeline(5)]
+    model = WorkspaceModel(workspace)
+    assert model.get_pipeline(3)['Checker'] == 'GHI'
+    assert model.get_pipeline(-1) == make_pipeline(5)
+    assert len(model.get_table()) == 6
+
+
+def test_workspace_manifest(workspace, monkeypatch):
+    WorkspaceModel(workspace).files()
+    assert os.path.exists(
+        os.path.join(workspace, WorkspaceModel.manifest_name))
+
+    scanned = []
+    scan_csv = models._scan_csv
+
+    def record_scan(filename):
+        scanned.append(os.path.basename(filename))
+        return scan_csv(filename)
+
+    monkeypatch.setattr(models, '_scan_csv', record_scan)
+
+    # unchanged files are found from the manifest alone
+    model = WorkspaceModel(workspace)
+    assert len(model.files()) == 2
+    assert model.get_pipeline(4) == make_pipeline(4)
+    assert scanned == []
+
+    # only a changed file is scanned again
+    append_csv(os.path.join(workspace, 'wt_data_2018-09-25.csv'),
+               [make_pipeline(5)])
+    model = WorkspaceModel(workspace)
+    assert model.get_pipeline(5) == make_pipeline(5)
+    assert scanned == ['wt_data_2018-09-25.csv']
+
+    # deleted files are dropped from it
+    os.remove(os.path.join(workspace, 'notes.csv'))
+    model = WorkspaceModel(workspace)
+    model.files()
+    assert 'notes.csv' not in WorkspaceModel(workspace).manifest
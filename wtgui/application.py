@@ -2,14 +2,31 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
 from tkinter import messagebox
+import os
 from datetime import datetime
 from . import views as v
 from . import models as m
+from . import tasks as t
+from . import search as s
+from .profiling import tracer, traced
 
 
 class Application(tk.Tk):
     """Application root window"""
 
+    # storage backends by file extension, CSV is the default, including
+    # compressed .csv.gz and .csv.xz files
+    backends = {
+        '.db': m.SQLiteModel,
+        '.sqlite': m.SQLiteModel
+    }
+
+    # milliseconds without changes before changed settings are saved
+    settings_delay = 1000
+
+    # milliseconds between checks for rows appended to the file
+    watch_interval = 2000
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -20,73 +37,223 @@ class Application(tk.Tk):
         datestring = datetime.today().strftime('%Y-%m-%d')
         default_filename = f'wt_data_{datestring}.csv'
         self.filename = tk.StringVar(value=default_filename)
-        self.data_model = m.CSVModel(filename=self.filename.get())
+        self.data_model = self.open_data_model(self.filename.get())
         self.settings_model = m.SettingsModel()
+        self._settings_job = None
         self.load_settings()
 
         self.callbacks = {
             'file->select': self.on_file_select,
-            'file->quit': self.quit,
+            'file->workspace': self.on_workspace_select,
+            'file->compact': self.on_compact,
+            'file->import': self.on_import,
+            'file->export': self.on_export,
+            'file->cancel': self.on_cancel,
+            'file->export_timings': self.on_export_timings,
+            'file->quit': self.on_quit,
             'show_pipelinelist': self.show_pipelinelist,
             'new_pipeline': self.open_pipeline,
             'on_open_pipeline': self.open_pipeline,
-            'on_calculate': self.on_calculate
+            'on_calculate': self.on_calculate,
+            'show_sweep': self.show_sweep,
+            'on_sweep': self.on_sweep,
+            'on_sweep_export': self.on_sweep_export
         }
 
         menu = v.MainMenu(self, self.settings, self.callbacks)
         self.config(menu=menu)
+        self.bind('<Escape>', lambda event: self.on_cancel())
+        self.protocol('WM_DELETE_WINDOW', self.on_quit)
+
+        # status bar
+        statusframe = tk.Frame(self)
+        statusframe.grid(sticky="we", row=2, padx=10)
+        statusframe.columnconfigure(0, weight=1)
+        self.status = tk.StringVar()
+        self.statusbar = ttk.Label(statusframe, textvariable=self.status)
+        self.statusbar.grid(sticky="we", row=0, column=0)
+
+        # timing of the last operation, shown when recording timings
+        self.timing = tk.StringVar()
+        self.timingbar = ttk.Label(statusframe, textvariable=self.timing)
+        self.timingbar.grid(sticky="e", row=0, column=1, padx=(10, 0))
+        self._timing_job = None
+        self.settings['record timings'].trace('w', self.on_record_timings)
+        self.on_record_timings()
+
+        # model calls run in the background, see tasks.TaskRunner
+        self.tasks = t.TaskRunner(self, self.status)
 
-        # the input data form
-        self.inputdataform = v.InputDataForm(
-            self, m.CSVModel.fields, self.settings, self.callbacks)
-        self.inputdataform.grid(row=1, padx=10)
+        # the input data form is built the first time it's needed, see
+        # the inputdataform property
+        self._inputdataform = None
+        self.suggestions = None
 
-        # the pipeline list
+        # the pipeline open in the form as it was read, so a save can tell
+        # if someone else has changed it since
+        self.loaded_pipeline = None
+
+        # the pipeline list, loaded once the window has been drawn
         self.pipelinelist = v.PipelineList(self, self.callbacks)
         self.pipelinelist.grid(row=1, padx=10, sticky='NSEW')
-        self.populate_pipelinelist()
-
-        # status bar
-        self.status = tk.StringVar()
-        self.statusbar = ttk.Label(self, textvariable=self.status)
-        self.statusbar.grid(sticky="we", row=2, padx=10)
+        self.after_idle(self.populate_pipelinelist)
+        self.after(self.watch_interval, self.watch_file)
 
         self.calcs_ran = 0
 
+    @property
+    def inputdataform(self):
+        """The input data form, built the first time it's used"""
+
+        if self._inputdataform is None:
+            self._inputdataform = v.InputDataForm(
+                self, m.CSVModel.fields, self.settings, self.callbacks)
+            self._inputdataform.grid(row=1, padx=10)
+            # keep the pipeline list showing until the form is raised
+            self._inputdataform.lower(self.pipelinelist)
+            self._inputdataform.set_suggestions(self.suggestions)
+        return self._inputdataform
+
+    @traced
     def show_pipelinelist(self):
         """Show the pipeline list"""
 
         self.pipelinelist.tkraise()
 
-    def populate_pipelinelist(self):
-        try:
-            rows = self.data_model.get_all_pipelines()
-        except Exception as e:
-            messagebox.showerror(
-                title='Error',
-                message='Problem reading file',
-                detail=str(e)
+    @traced
+    def populate_pipelinelist(self, incremental=False):
+        """Load the pipelines into the pipeline list
+
+        With incremental set, only rows that changed since the last
+        load are written to the list, and added to the suggestions.
+        """
+
+        # the suggestions are only built from scratch on a full load
+        build = not incremental or self.suggestions is None
+
+        def index_suggestions(rows):
+            suggestions = s.SuggestionIndex(
+                v.InputDataForm.suggestion_fields)
+            suggestions.build(rows)
+            return suggestions
+
+        def load(progress=None):
+            # a PipelineTable takes a fraction of the memory of the dicts
+            if hasattr(self.data_model, 'get_table'):
+                rows = self.data_model.get_table(progress=progress)
+            else:
+                rows = self.data_model.get_all_pipelines(progress=progress)
+            # build the search indexes off the main thread
+            index = None
+            if not incremental:
+                index = s.PrefixIndex(v.PipelineList.search_fields)
+                index.build(rows)
+            suggestions = index_suggestions(rows) if build else None
+            return rows, index, suggestions
+
+        def on_done(result):
+            rows, index, suggestions = result
+            old_rows = self.pipelinelist.rows
+            if incremental:
+                rownums = self.pipelinelist.refresh(rows)
+            else:
+                self.pipelinelist.populate(rows, index)
+            if suggestions is not None:
+                self.set_suggestions(suggestions)
+            elif rownums is not None:
+                # swap the old values of changed rows for their new ones
+                for rownum in rownums:
+                    if rownum < len(old_rows):
+                        self.suggestions.remove(rownum, old_rows[rownum])
+                    self.suggestions.add(rownum, rows[rownum])
+                for rownum in range(len(rows), len(old_rows)):
+                    self.suggestions.remove(rownum, old_rows[rownum])
+            else:
+                # the list was repopulated, so start the suggestions again
+                self.tasks.submit(
+                    index_suggestions, rows,
+                    description='Indexing pipelines',
+                    on_done=self.set_suggestions
+                )
+
+        self.tasks.submit(
+            load,
+            description='Loading pipelines',
+            on_done=on_done,
+            on_error=self.on_read_error,
+            progress=True
+        )
+
+    def watch_file(self):
+        """Add rows appended to the file by someone else to the list
+
+        Stats the file every watch_interval milliseconds while nothing
+        else is using the data model, and reads it on the worker thread
+        if it has changed. Only the appended rows are read, see
+        CSVModel.tail; any other change reloads the list.
+        """
+
+        self.after(self.watch_interval, self.watch_file)
+        if self.tasks.busy or not hasattr(self.data_model, 'tail'):
+            return
+        if self.data_model.tail_pending():
+            self.tasks.submit(
+                self.data_model.tail,
+                description='Checking file',
+                on_done=self.on_tail
             )
-        else:
-            self.pipelinelist.populate(rows)
 
+    def on_tail(self, rows):
+        """Add the rows read by CSVModel.tail to the list"""
+
+        if rows is None:
+            self.populate_pipelinelist(incremental=True)
+            return
+        if not rows:
+            return
+
+        start = len(self.pipelinelist.rows)
+        self.pipelinelist.append(rows)
+        if self.suggestions is not None:
+            for rownum, row in enumerate(rows, start):
+                self.suggestions.add(rownum, row)
+        self.status.set(f'{len(rows)} new pipelines added to the file')
+
+    def set_suggestions(self, suggestions):
+        """Use a search.SuggestionIndex for autocompletion in the form"""
+
+        self.suggestions = suggestions
+        if self._inputdataform is not None:
+            self._inputdataform.set_suggestions(suggestions)
+
+    def on_read_error(self, e):
+        messagebox.showerror(
+            title='Error',
+            message='Problem reading file',
+            detail=str(e)
+        )
+
+    @traced
     def open_pipeline(self, rownum=None):
         if rownum is None:
-            pipeline = None
+            self.load_pipeline(rownum, None)
         else:
             rownum = int(rownum)
-            try:
-                pipeline = self.data_model.get_pipeline(rownum)
-            except Exception as e:
-                messagebox.showerror(
-                    title='Error',
-                    message='Problem reading file',
-                    detail=str(e)
-                )
-                return
+            self.tasks.submit(
+                self.data_model.get_pipeline, rownum,
+                description='Opening pipeline',
+                on_done=lambda pipeline: self.load_pipeline(rownum, pipeline),
+                on_error=self.on_read_error
+            )
+
+    def load_pipeline(self, rownum, pipeline):
+        """Show a pipeline in the input data form"""
+
+        self.loaded_pipeline = pipeline
         self.inputdataform.load_pipeline(rownum, pipeline)
         self.inputdataform.tkraise()
 
+    @traced
     def on_calculate(self):
         """Handles calculation button clicks"""
 
@@ -106,16 +273,36 @@ class Application(tk.Tk):
 
         data = self.inputdataform.get()
         rownum = self.inputdataform.current_pipeline
-        try:
-            self.data_model.save_pipeline(data, rownum)
-        except IndexError as e:
+        expected = self.loaded_pipeline if rownum is not None else None
+
+        def on_done(result):
+            if rownum is not None:
+                self.loaded_pipeline = data
+            self.on_saved()
+
+        self.tasks.submit(
+            self.data_model.save_pipeline, data, rownum, expected,
+            description='Saving pipeline',
+            on_done=on_done,
+            on_error=self.on_save_error
+        )
+
+    def on_save_error(self, e):
+        if isinstance(e, m.ConflictError):
+            messagebox.showerror(
+                title='Error',
+                message='Pipeline changed by someone else',
+                detail=f'{e}. Open it again to see their changes.'
+            )
+            self.status.set('Pipeline not saved, it was changed elsewhere')
+        elif isinstance(e, IndexError):
             messagebox.showerror(
                 title='Error',
                 message='Invalid row specified',
                 detail=str(e)
             )
             self.status.set('Tried to update invalid row')
-        except Exception as e:
+        else:
             messagebox.showerror(
                 title='Error',
                 message='Problem saving pipeline',
@@ -123,38 +310,321 @@ class Application(tk.Tk):
             )
             self.status.set('Problem saving pipeline')
 
+    @traced
+    def on_saved(self, *args):
+        """Update the views once a pipeline has been saved"""
+
+        self.calcs_ran += 1
+
+        if self.calcs_ran > 1:
+            plural = 's'
         else:
+            plural = ''
 
-            self.calcs_ran += 1
+        self.status.set(
+            f'{self.calcs_ran} calculation{plural} run this session')
+        self.populate_pipelinelist(incremental=True)
+        # only reset the form when we're appending pipelines
+        if self.inputdataform.current_pipeline is None:
+            self.inputdataform.reset()
 
-            if self.calcs_ran > 1:
-                plural = 's'
-            else:
-                plural = ''
+    @traced
+    def show_sweep(self):
+        """Open the parametric sweep dialog"""
 
-            self.status.set(
-                f'{self.calcs_ran} calculation{plural} run this session')
-            self.populate_pipelinelist()
-            # only reset the form when we're appending pipelines
-            if self.inputdataform.current_pipeline is None:
-                self.inputdataform.reset()
+        v.SweepForm(self, m.CSVModel.fields, self.inputdataform.get(),
+                    self.callbacks)
+
+    @traced
+    def on_sweep(self, form):
+        """Handle the sweep dialog's run button"""
+
+        # imported here as NumPy is slow to import, see run.py
+        from . import pd8010
+
+        try:
+            result = pd8010.calc_sweep(form.get())
+        except KeyError as e:
+            messagebox.showerror(
+                title='Error',
+                message='Cannot run sweep',
+                detail=f'A value is required for {e}',
+                parent=form
+            )
+        except ValueError as e:
+            messagebox.showerror(
+                title='Error',
+                message='Cannot run sweep',
+                detail=str(e),
+                parent=form
+            )
+        else:
+            form.show_results(result)
+            self.status.set(f'{len(result)} sweep points calculated')
+
+    @traced
+    def on_sweep_export(self, result):
+        """Handle the sweep dialog's export button"""
+
+        filename = filedialog.asksaveasfilename(
+            title='Select the target file for the sweep results',
+            defaultextension='.csv',
+            filetypes=[('Comma-Separated Values', '*.csv *.CSV')]
+        )
+        if not filename:
+            return
+
+        from . import batch
 
+        def on_error(e):
+            messagebox.showerror(
+                title='Error',
+                message='Problem exporting sweep',
+                detail=str(e)
+            )
+
+        self.tasks.submit(
+            batch.write_sweep, result, filename, self.inputdataform.get(),
+            description='Exporting sweep',
+            on_done=lambda count: self.status.set(
+                f'{count} sweep points exported'),
+            on_error=on_error
+        )
+
+    @traced
     def on_file_select(self):
         """Handle the file->select action from the menu"""
 
+        filetypes = [
+            ('Comma-Separated Values', '*.csv *.CSV'),
+            ('Compressed CSV (gzip)', '*.csv.gz'),
+            ('Compressed CSV (xz)', '*.csv.xz'),
+            ('SQLite Database', '*.db *.sqlite')
+        ]
+        filetype = tk.StringVar(value=filetypes[0][0])
         filename = filedialog.asksaveasfilename(
             title='Select the target file for saving records',
-            defaultextension='.csv',
-            filetypes=[('Comma-Separated Values', '*.csv *.CSV')]
+            filetypes=filetypes,
+            typevariable=filetype
         )
         if filename:
+            # give a bare file name the chosen type's extension, which
+            # defaultextension can't do for .csv.gz or .csv.xz
+            extensions = tuple(
+                pattern[1:].lower()
+                for label, patterns in filetypes
+                for pattern in patterns.split()
+            )
+            if not filename.lower().endswith(extensions):
+                patterns = dict(filetypes).get(filetype.get(), '*.csv')
+                filename += patterns.split()[0][1:]
             self.filename.set(filename)
-            self.data_model = m.CSVModel(filename=self.filename.get())
-            self.populuate_pipelinelist()
+            self.tasks.submit(
+                self.open_data_model, filename,
+                description='Opening file',
+                on_done=self.set_data_model,
+                on_error=self.on_read_error
+            )
+
+    @traced
+    def on_workspace_select(self):
+        """Handle the file->open workspace action from the menu"""
+
+        directory = filedialog.askdirectory(
+            title='Select a directory of WTGUI CSV files',
+            mustexist=True
+        )
+        if directory:
+            self.filename.set(directory)
+            self.tasks.submit(
+                self.open_data_model, directory,
+                description='Opening workspace',
+                on_done=self.set_data_model,
+                on_error=self.on_read_error
+            )
+
+    def set_data_model(self, data_model):
+        self.data_model = data_model
+        self.populate_pipelinelist()
+
+    def open_data_model(self, filename):
+        """Create the storage model for a file based on its extension
+
+        A directory is opened as a workspace of all the CSV files in it.
+        """
+
+        if os.path.isdir(filename):
+            return m.WorkspaceModel(filename)
+        extension = os.path.splitext(filename)[1].lower()
+        model_class = self.backends.get(extension, m.CSVModel)
+        return model_class(filename=filename)
+
+    @traced
+    def on_import(self):
+        """Handle the file->import action from the menu"""
+
+        if not hasattr(self.data_model, 'import_csv'):
+            messagebox.showinfo(
+                title='Import',
+                message='Import is only available for database files'
+            )
+            return
+        filename = filedialog.askopenfilename(
+            title='Select a CSV file to import',
+            filetypes=[('Comma-Separated Values', '*.csv *.CSV')]
+        )
+        if not filename:
+            return
+
+        def on_done(count):
+            self.status.set(f'{count} pipelines imported')
+            self.populate_pipelinelist()
+
+        def on_error(e):
+            messagebox.showerror(
+                title='Error',
+                message='Problem importing file',
+                detail=str(e)
+            )
+
+        self.tasks.submit(
+            self.data_model.import_csv, filename,
+            description='Importing file',
+            on_done=on_done,
+            on_error=on_error
+        )
+
+    @traced
+    def on_export(self):
+        """Handle the file->export action from the menu"""
+
+        if not hasattr(self.data_model, 'export_csv'):
+            messagebox.showinfo(
+                title='Export',
+                message='Export is only available for database files'
+            )
+            return
+        filename = filedialog.asksaveasfilename(
+            title='Select the target file for exported records',
+            defaultextension='.csv',
+            filetypes=[('Comma-Separated Values', '*.csv *.CSV')]
+        )
+        if not filename:
+            return
+
+        def on_error(e):
+            messagebox.showerror(
+                title='Error',
+                message='Problem exporting file',
+                detail=str(e)
+            )
+
+        self.tasks.submit(
+            self.data_model.export_csv, filename,
+            description='Exporting file',
+            on_done=lambda count: self.status.set(
+                f'{count} pipelines exported'),
+            on_error=on_error
+        )
+
+    def on_record_timings(self, *args):
+        """Switch the tracer on or off to match the settings"""
+
+        tracer.enabled = self.settings['record timings'].get()
+        if self._timing_job is not None:
+            self.after_cancel(self._timing_job)
+            self._timing_job = None
+        if tracer.enabled:
+            self.show_timing()
+        else:
+            self.timing.set('')
+
+    def show_timing(self):
+        """Show the last recorded span while timings are being recorded"""
+
+        self._timing_job = None
+        if not tracer.enabled:
+            return
+        span = tracer.last
+        if span:
+            timing = f"{span['name']}: {span['duration'] * 1000:.1f} ms"
+            if span['rows'] is not None:
+                timing += f", {span['rows']} rows"
+            self.timing.set(timing)
+        self._timing_job = self.after(250, self.show_timing)
+
+    def on_export_timings(self):
+        """Handle the file->export_timings action from the menu"""
+
+        filename = filedialog.asksaveasfilename(
+            title='Select the target file for recorded timings',
+            defaultextension='.json',
+            filetypes=[
+                ('Chrome Trace', '*.json'),
+                ('JSON Lines', '*.jsonl')
+            ]
+        )
+        if not filename:
+            return
+        try:
+            tracer.dump(filename)
+        except Exception as e:
+            messagebox.showerror(
+                title='Error',
+                message='Problem exporting timings',
+                detail=str(e)
+            )
+        else:
+            self.status.set(f'{len(tracer.spans)} timings exported')
+
+    def on_cancel(self):
+        """Cancel any long-running loads"""
+
+        self.tasks.cancel()
+
+    def on_quit(self):
+        """Stop background work and close the application"""
+
+        self.tasks.shutdown()
+        self.flush_settings()
+        self.destroy()
+
+    @traced
+    def on_compact(self):
+        """Handle the file->compact action from the menu"""
+
+        def on_error(e):
+            messagebox.showerror(
+                title='Error',
+                message='Problem compacting file',
+                detail=str(e)
+            )
+
+        self.tasks.submit(
+            self.data_model.compact,
+            description='Compacting file',
+            on_done=lambda result: self.status.set('File compacted'),
+            on_error=on_error
+        )
 
     def save_settings(self, *args):
-        """Save the current settings to the preferences file"""
+        """Save the settings once they've been left alone for a moment
+
+        A burst of changes is written to the preferences file once, after
+        settings_delay, or when the application closes.
+        """
+
+        if self._settings_job is not None:
+            self.after_cancel(self._settings_job)
+        self._settings_job = self.after(
+            self.settings_delay, self.flush_settings)
+
+    def flush_settings(self):
+        """Save the current settings to the preferences file now"""
 
+        if self._settings_job is not None:
+            self.after_cancel(self._settings_job)
+            self._settings_job = None
         for key, variable in self.settings.items():
             self.settings_model.set(key, variable.get())
         self.settings_model.save()
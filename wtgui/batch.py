@@ -0,0 +1,137 @@
+import csv
+import errno
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from .models import CSVModel
+from . import pd8010
+
+
+result_fields = ['t_req', 'util']
+fieldnames = list(CSVModel.fields.keys()) + result_fields
+
+
+def check_inputs(filenames):
+    """Raise FileNotFoundError for the first input file that doesn't exist"""
+
+    for filename in filenames:
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(
+                errno.ENOENT, os.strerror(errno.ENOENT), filename)
+
+
+def read_chunks(filenames, chunksize):
+    """Yield lists of pipeline dicts read from WTGUI-format CSV files
+
+    Rows come from CSVModel.iter_pipelines, so edits saved to a file's
+    journal are included. Values are left as text, which is all the
+    calculation and the output file need. Every input is checked before
+    any rows are read, so a missing file raises FileNotFoundError.
+    """
+
+    check_inputs(filenames)
+    for filename in filenames:
+        pipelines = CSVModel(filename).iter_pipelines(typed=False)
+        while True:
+            chunk = list(islice(pipelines, chunksize))
+            if not chunk:
+                break
+            yield chunk
+
+
+def format_result(value):
+    """Format a calculated value for the output CSV"""
+
+    if value != value:  # NaN, e.g. no selected wall thickness
+        return ''
+    return f'{value:.4f}'
+
+
+def calc_chunk(rows, pressure):
+    """Run the PD8010 calculation over a chunk of pipeline dicts"""
+
+    table = {
+        key: [row[key] for row in rows]
+        for key in ('D_o', 'SMYS', 't_cor', 'tol', 'B', 't_sel')
+    }
+    t_req, util = pd8010.calc_wallthick_table(table, pressure)
+    for row, row_t_req, row_util in zip(rows, t_req, util):
+        row['t_req'] = format_result(row_t_req)
+        row['util'] = format_result(row_util)
+    return rows
+
+
+def run_batch(filenames, output, pressure, chunksize=10000, workers=None):
+    """Calculate every pipeline in the input files and stream to output
+
+    Chunks are processed across a pool of worker processes, sized to the
+    machine's cores by default, and written in input order. Only a few
+    chunks per worker are held in memory at once.
+
+    Raises FileNotFoundError, before the output is opened, if an input
+    file is missing. Returns the number of rows written.
+    """
+
+    check_inputs(filenames)
+    workers = workers or os.cpu_count() or 1
+    count = 0
+
+    if output == '-':
+        fh = sys.stdout
+    else:
+        fh = open(output, 'w', newline='')
+
+    try:
+        csvwriter = csv.DictWriter(fh, fieldnames=fieldnames,
+                                   extrasaction='ignore')
+        csvwriter.writeheader()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in read_chunks(filenames, chunksize):
+                pending.append(executor.submit(calc_chunk, chunk, pressure))
+                if len(pending) >= workers * 2:
+                    rows = pending.popleft().result()
+                    csvwriter.writerows(rows)
+                    count += len(rows)
+            while pending:
+                rows = pending.popleft().result()
+                csvwriter.writerows(rows)
+                count += len(rows)
+    finally:
+        if fh is not sys.stdout:
+            fh.close()
+
+    return count
+
+
+def write_sweep(result, output, base=None):
+    """Write the rows of a pd8010.SweepResult to a CSV file
+
+    Fields that weren't swept are filled in from the base dict, typically
+    the input data form's values. Returns the number of rows written.
+    """
+
+    sweep_fieldnames = (list(CSVModel.fields.keys()) + ['p'] +
+                        list(result.result_fields))
+    base = {
+        key: value for key, value in (base or {}).items()
+        if key in sweep_fieldnames
+    }
+    columns = {
+        name: column.tolist() for name, column in result.columns.items()
+    }
+    for name in result.result_fields:
+        columns[name] = [format_result(value) for value in columns[name]]
+
+    with open(output, 'w', newline='') as fh:
+        csvwriter = csv.DictWriter(fh, fieldnames=sweep_fieldnames)
+        csvwriter.writeheader()
+        for index in range(len(result)):
+            row = dict(base)
+            for name, column in columns.items():
+                row[name] = column[index]
+            csvwriter.writerow(row)
+
+    return len(result)
@@ -1,7 +1,93 @@
 import csv
+import glob
+import gzip
+import io
+import locale
+import lzma
+import multiprocessing
 import os
 import json
+import shutil
+import sqlite3
+import tempfile
+import time
+from array import array
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from itertools import islice
 from .constants import FieldTypes as FT
+from .profiling import traced
+from .validation import Validator
+
+try:
+    import fcntl
+except ImportError:
+    # advisory locks aren't available on Windows, see CSVModel._locked
+    fcntl = None
+
+
+def _parse_bool(value):
+    return value.lower() in ('true', 'yes', '1')
+
+
+# functions converting stored text to each field type's value
+converters = {
+    FT.decimal: Decimal,
+    FT.integer: int,
+    FT.iso_date_string: date.fromisoformat,
+    FT.boolean: _parse_bool
+}
+
+
+def _converters(fields, keys, typed=True):
+    """Get a (key, converter) list for the named fields
+
+    Raises ValueError for unknown names. Strings, and every field if typed
+    is False, have no converter.
+    """
+
+    for key in keys:
+        if key not in fields:
+            raise ValueError(f'Unknown field: {key}')
+    return [
+        (key, converters.get(fields[key]['type']) if typed else None)
+        for key in keys
+    ]
+
+
+def _typed(record, fieldconverters, rownum):
+    """Convert a sequence of stored text values to a typed pipeline dict
+
+    Blank values of fields that aren't strings become None.
+    """
+
+    pipeline = {}
+    for value, (key, converter) in zip(record, fieldconverters):
+        if converter is not None:
+            if value == '':
+                value = None
+            else:
+                try:
+                    value = converter(value)
+                except (ValueError, ArithmeticError):
+                    raise ValueError(
+                        f'Row {rownum}: invalid {key} value {value!r}')
+        pipeline[key] = value
+    return pipeline
+
+
+# modules for the compressed file extensions CSVModel reads and writes
+compressors = {
+    '.gz': gzip,
+    '.xz': lzma
+}
+
+
+class ConflictError(Exception):
+    """A pipeline was changed by someone else since it was opened"""
 
 
 class CSVModel:
@@ -32,26 +118,343 @@ class CSVModel:
               'inc': .01},
     }
 
+    # size of the JSON header block at the start of the row index file
+    index_header_size = 512
+
+    # number of journalled edits that triggers a compaction
+    journal_limit = 1000
+
+    # rows read between progress reports in get_all_pipelines
+    progress_interval = 10000
+
+    # most appended bytes read by tail, more are left to a full read
+    tail_limit = 1 << 20
+
+    # bytes before the end of the file checked by tail for a rewrite
+    tail_sample_size = 64
+
+    # seconds a save waits for another program's lock on the file, and
+    # between attempts to take it
+    lock_timeout = 10
+    lock_interval = .05
+
     def __init__(self, filename):
         self.filename = filename
+        self.index_filename = filename + '.idx'
+        self.journal_filename = filename + '.journal'
+        self.lock_filename = filename + '.lock'
+        self.encoding = locale.getpreferredencoding(False)
+        self.compression = compressors.get(
+            os.path.splitext(filename)[1].lower())
 
-    def get_all_pipelines(self):
-        if not os.path.exists(self.filename):
+        # row number to byte offset index, see _update_index
+        self._index_signature = None
+        self._fieldnames = None
+        self._offsets = None
+
+        # edited rows by row number, see _load_journal
+        self._journal_signature = None
+        self._journal = None
+        self._journal_records = 0
+
+        # parsed rows, valid while the file's signature is unchanged
+        self._rows_signature = None
+        self._rows = None
+
+        # the same as a PipelineTable, see get_table
+        self._table_signature = None
+        self._table = None
+
+        # the (signature, inode, last bytes) of the file, and the last
+        # state tail asked to be read in full, see tail
+        self._tail_mark = None
+        self._tail_reported = None
+
+        # descriptor of the lock file while the lock is held, see _locked
+        self._lock_fd = None
+
+    @classmethod
+    def check_fields(cls, fieldnames):
+        """Raise an exception if a CSV header is missing any fields"""
+
+        missing_fields = set(cls.fields.keys()) - set(fieldnames or [])
+        if len(missing_fields) > 0:
+            raise Exception(
+                "File is missing fields: {}"
+                .format(', '.join(missing_fields))
+            )
+
+    @traced
+    def get_all_pipelines(self, progress=None):
+        """Get all pipelines in the file as a list of dicts
+
+        Edits from the journal are merged over the rows in the file. Parsed
+        rows are cached and only re-read when the signature of the file or
+        the journal changes. The dicts are shared with the cache, so don't
+        modify them.
+
+        If given, progress is called with the number of rows read so far
+        every progress_interval rows; it may raise to abort the read.
+        """
+
+        if self._signature() is None:
             return []
+        signature = self._rows_state()
+        if self._rows is not None and signature == self._rows_signature:
+            return list(self._rows)
 
-        with open(self.filename, 'r') as fh:
+        with self.open_text() as fh:
             csvreader = csv.DictReader(fh)
-            missing_fields = (set(self.fields.keys()) -
-                              set(csvreader.fieldnames))
-            if len(missing_fields) > 0:
-                raise Exception(
-                    "File is missing fields: {}"
-                    .format(', '.join(missing_fields))
-                )
-            else:
-                pipelines = list(csvreader)
+            self.check_fields(csvreader.fieldnames)
+            pipelines = []
+            while True:
+                chunk = list(islice(csvreader, self.progress_interval))
+                if not chunk:
+                    break
+                pipelines.extend(chunk)
+                if progress:
+                    progress(len(pipelines))
+
+        self._fix_bools(pipelines)
+
+        for rownum, data in self._journal.items():
+            if rownum < len(pipelines):
+                pipelines[rownum] = dict(data)
+
+        self._rows_signature = signature
+        self._rows = pipelines
+        return list(pipelines)
+
+    def iter_pipelines(self, fields=None, typed=True):
+        """Iterate over the pipelines in the file as dicts of typed values
+
+        Values are converted to their field type: Decimal, int, date or
+        bool, with None for blank values of fields that aren't strings.
+        With typed False they're left as the stored text. Fields is an
+        optional sequence of the names to include. The file is read one
+        row at a time, with edits from the journal applied as their rows
+        go by.
+        """
+
+        fieldconverters = _converters(self.fields, fields or self.fields,
+                                      typed)
+        keys = [key for key, converter in fieldconverters]
+        if self._signature() is None:
+            return
+
+        # reuse the parsed rows if get_all_pipelines has them
+        if self._rows is not None and self._rows_state() == \
+                self._rows_signature:
+            rows = self._rows
+            for rownum, row in enumerate(rows):
+                record = [
+                    '' if row[key] is None else str(row[key])
+                    for key in keys
+                ]
+                yield _typed(record, fieldconverters, rownum)
+            return
+
+        journal = dict(self._load_journal())
+        with self.open_text() as fh:
+            csvreader = csv.reader(fh)
+            header = next(csvreader, None)
+            self.check_fields(header)
+            positions = [header.index(key) for key in keys]
+            width = len(header)
+            # skip blank lines, as DictReader and _build_index do, so the
+            # row numbers match theirs
+            records = (record for record in csvreader if record)
+            for rownum, record in enumerate(records):
+                if rownum in journal:
+                    edit = journal[rownum]
+                    record = [str(edit[key]) for key in keys]
+                else:
+                    if len(record) < width:
+                        # short rows are missing their last values
+                        record = record + [''] * (width - len(record))
+                    record = [record[position] for position in positions]
+                yield _typed(record, fieldconverters, rownum)
+
+    @traced
+    def get_table(self, progress=None):
+        """Get all pipelines in the file as a PipelineTable
+
+        This holds the same rows as get_all_pipelines in a fraction of the
+        memory. The table is cached like the rows are, and a copy returned
+        so later saves don't change it. Progress is reported as in
+        get_all_pipelines.
+        """
+
+        signature = self._rows_state()
+        if self._table is not None and signature == self._table_signature:
+            return self._table.copy()
+
+        table = PipelineTable(self.fields)
+        pipelines = self.iter_pipelines(typed=False)
+        while True:
+            chunk = list(islice(pipelines, self.progress_interval))
+            if not chunk:
+                break
+            table.extend(chunk)
+            if progress:
+                progress(len(table))
+
+        self._table_signature = signature
+        self._table = table
+        return table.copy()
+
+    @traced
+    def tail(self):
+        """Read rows appended to the file by someone else
+
+        Works from the rows or table already read by get_all_pipelines or
+        get_table, and reads only the bytes added to the end of the file
+        since then. The new rows are added to the cached ones and returned
+        as dicts like get_all_pipelines gives. Returns an empty list if
+        nothing has been appended, or a row is still being written.
+
+        Returns None if the file or journal changed in any other way, e.g.
+        rewritten by compact or truncated, if there's too much to read or
+        it can't be read, and the file needs to be read again in full. This
+        is only returned once for each change, and for any change to a
+        compressed file. See tail_pending for a quick check first.
+        """
+
+        old = self._tail_base()
+        if old is None:
+            return []
+        state = self._rows_state()
+        if state == old:
+            if self._mark_outdated(old):
+                self._tail_mark = self._read_tail_mark(old[0])
+            return []
+        if state == self._tail_reported:
+            return []
+
+        try:
+            pipelines = self._read_appended(old, state)
+        except Exception:
+            # e.g. a file replaced while we read it, or a bad row, which
+            # a full read will report
+            pipelines = None
+        if pipelines is None:
+            self._tail_reported = state
+        return pipelines
+
+    def tail_pending(self):
+        """Check whether tail has anything to do, without reading anything
+
+        Only the file and journal are stat'ed, so this is cheap enough to
+        poll from the Tk main thread.
+        """
+
+        old = self._tail_base()
+        if old is None:
+            return False
+        state = [self._signature(), self._signature(self.journal_filename)]
+        if state == old:
+            return self._mark_outdated(old)
+        return state != self._tail_reported
+
+    def _tail_base(self):
+        """Get the state of the file the cached rows or table were read at"""
+
+        if self._table is not None:
+            return self._table_signature
+        return self._rows_signature
+
+    def _mark_outdated(self, old):
+        return old[0] is not None and (
+            self._tail_mark is None or self._tail_mark[0] != old[0])
+
+    def _read_appended(self, old, state):
+        """Read the rows appended since the old state, see tail"""
+
+        if old[0] is None or state[0] is None or state[1] != old[1]:
+            return None
+        # appends to a compressed file can't be read on their own
+        if self.compression is not None:
+            return None
+        if self._tail_mark is None or self._tail_mark[0] != old[0]:
+            return None
+
+        start = old[0][1]
+        end = state[0][1]
+        if not 0 < end - start <= self.tail_limit:
+            return None
+
+        mark, inode, sample = self._tail_mark
+        with open(self.filename, 'rb') as fh:
+            # a file replaced or rewritten in place isn't an append
+            if os.fstat(fh.fileno()).st_ino != inode:
+                return None
+            fh.seek(start - len(sample))
+            if fh.read(len(sample)) != sample:
+                return None
+            data = fh.read(end - start)
+
+        # find where each row starts, as in _build_index, and wait for
+        # the writer to finish the last one
+        starts = []
+        position = start
+        quoted = False
+        for line in data.splitlines(keepends=True):
+            if not quoted and line.strip(b'\r\n'):
+                starts.append(position)
+            if line.count(b'"') % 2:
+                quoted = not quoted
+            position += len(line)
+        if quoted or not data.endswith(b'\n'):
+            return []
+
+        if self._fieldnames is None:
+            with open(self.filename, 'r') as fh:
+                fieldnames = next(csv.reader(fh), None)
+        else:
+            fieldnames = self._fieldnames
+        self.check_fields(fieldnames)
+        csvreader = csv.DictReader(
+            io.StringIO(data.decode(self.encoding), newline=''),
+            fieldnames=fieldnames)
+        pipelines = list(csvreader)
+        self._fix_bools(pipelines)
+
+        if self._offsets is not None and self._index_signature == old[0]:
+            self._append_index(starts, state[0])
+        if self._rows is not None and self._rows_signature == old:
+            self._rows.extend(dict(pipeline) for pipeline in pipelines)
+            self._rows_signature = state
+        if self._table is not None and self._table_signature == old:
+            self._table.extend(pipelines)
+            self._table_signature = state
+        self._tail_mark = (state[0], inode,
+                           (sample + data)[-self.tail_sample_size:])
+        return pipelines
+
+    def _read_tail_mark(self, signature):
+        """Get the tail mark of a file with the given signature, or None"""
+
+        size = signature[1]
+        with open(self.filename, 'rb') as fh:
+            stat = os.fstat(fh.fileno())
+            if [stat.st_mtime_ns, stat.st_size] != signature:
+                return None
+            fh.seek(max(0, size - self.tail_sample_size))
+            return (signature, stat.st_ino, fh.read())
+
+    def _as_read(self, data):
+        """Convert a dict of data to the row that reading it back gives"""
+
+        row = {
+            key: '' if data.get(key) is None else str(data.get(key))
+            for key in self.fields.keys()
+        }
+        self._fix_bools([row])
+        return row
+
+    def _fix_bools(self, pipelines):
+        """Correct issue with boolean fields"""
 
-        # correct issue with boolean fields
         trues = ('true', 'yes', '1')
         bool_fields = [
             key for key, meta
@@ -62,8 +465,227 @@ class CSVModel:
             for key in bool_fields:
                 pipeline[key] = pipeline[key].lower() in trues
 
-        return pipelines
+    def _reader(self, raw):
+        """Get a binary file reading the decompressed contents of raw"""
+
+        if self.compression is None:
+            return raw
+        return self.compression.open(raw, 'rb')
+
+    def _text(self, raw, mode='r'):
+        """Wrap a binary file for reading or writing the CSV text
+
+        Compressed files are compressed or decompressed as they go, so
+        they're never held whole in memory or on disk.
+        """
+
+        if self.compression is None:
+            return io.TextIOWrapper(raw, encoding=self.encoding, newline='')
+        return self.compression.open(raw, mode + 't', encoding=self.encoding,
+                                     newline='')
+
+    @contextmanager
+    def open_text(self):
+        """Open the file for reading its CSV text, see _text"""
 
+        with open(self.filename, 'rb') as raw, self._text(raw) as fh:
+            yield fh
+
+    def _signature(self, filename=None):
+        """Get the (mtime, size) signature of the file, or None"""
+
+        try:
+            stat = os.stat(filename or self.filename)
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _rows_state(self):
+        """Get the signature of the file together with its journal"""
+
+        self._load_journal()
+        return [self._signature(), self._journal_signature]
+
+    def _load_journal(self):
+        """Load the journal of edited rows, if it has changed
+
+        Edits to existing rows are appended to a journal file next to the
+        CSV rather than rewriting it, see save_pipeline. Later records for
+        a row replace earlier ones.
+        """
+
+        signature = self._signature(self.journal_filename)
+        if self._journal is not None and signature == self._journal_signature:
+            return self._journal
+
+        edits = {}
+        records = 0
+        if signature is not None:
+            with open(self.journal_filename, 'r', newline='') as fh:
+                for record in csv.DictReader(fh):
+                    # skip a record left incomplete by a crash
+                    if None in record.values():
+                        continue
+                    edits[int(record.pop('row'))] = record
+                    records += 1
+            self._fix_bools(edits.values())
+
+        self._journal_signature = signature
+        self._journal = edits
+        self._journal_records = records
+        return edits
+
+    def _update_index(self):
+        """Make sure the row index matches the file on disk
+
+        The index is a list of the byte offsets at which each data row
+        starts. It is kept in a sidecar file next to the CSV, and is only
+        rebuilt when the file's mtime or size no longer match it. For a
+        compressed file, the offsets are into the decompressed data.
+        """
+
+        signature = self._signature()
+        if signature is None:
+            self._index_signature = None
+            self._fieldnames = None
+            self._offsets = array('q')
+            return
+        if self._offsets is not None and signature == self._index_signature:
+            return
+
+        try:
+            with open(self.index_filename, 'rb') as fh:
+                header = json.loads(fh.read(self.index_header_size))
+                offsets = array('q')
+                offsets.frombytes(fh.read())
+        except (OSError, ValueError):
+            header = None
+        if header and header.get('signature') == signature:
+            self._index_signature = signature
+            self._fieldnames = header['fieldnames']
+            self._offsets = offsets
+            return
+
+        self._build_index()
+        self._save_index()
+
+    def _build_index(self):
+        """Scan the file for the byte offset of each row
+
+        Only the rows in the file as it was opened are indexed, in case
+        another program appends to it or replaces it meanwhile.
+        """
+
+        fieldnames = None
+        offsets = array('q')
+        position = 0
+        quoted = False
+
+        with open(self.filename, 'rb') as raw:
+            stat = os.fstat(raw.fileno())
+            signature = [stat.st_mtime_ns, stat.st_size]
+            for line in self._reader(raw):
+                if self.compression is None and position >= signature[1]:
+                    break
+                # skip blank lines, as the csv reader does, unless
+                # we're inside a quoted value spanning several lines
+                if not quoted and line.strip(b'\r\n'):
+                    if fieldnames is None:
+                        fieldnames = next(csv.reader(
+                            [line.decode(self.encoding)]))
+                    else:
+                        offsets.append(position)
+                if line.count(b'"') % 2:
+                    quoted = not quoted
+                position += len(line)
+
+        self._index_signature = signature
+        self._fieldnames = fieldnames
+        self._offsets = offsets
+
+    def _index_header(self):
+        header = json.dumps({
+            'signature': self._index_signature,
+            'fieldnames': self._fieldnames
+        }).encode()
+        if len(header) >= self.index_header_size:
+            return None
+        return header.ljust(self.index_header_size - 1) + b'\n'
+
+    def _save_index(self):
+        """Write the row index to its sidecar file
+
+        The index is written to a temporary file which then replaces the
+        sidecar, as other programs reading the same CSV may be saving
+        their own index at the same time.
+        """
+
+        header = self._index_header()
+        if header is None:
+            return
+        dirname = os.path.dirname(os.path.abspath(self.index_filename))
+        try:
+            fd, tempname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        except OSError:
+            # the index is only an optimisation, e.g. on a read-only share
+            return
+        try:
+            with open(fd, 'wb') as fh:
+                fh.write(header)
+                self._offsets.tofile(fh)
+            os.replace(tempname, self.index_filename)
+        except OSError:
+            os.remove(tempname)
+
+    def _append_index(self, offsets, signature=None):
+        """Add newly appended rows to the row index and its sidecar file
+
+        Offsets is a list of the byte offsets the rows start at, and
+        signature is that of the file with them, by default its current
+        one.
+        """
+
+        old_header = self._index_header()
+        added = array('q', offsets)
+        self._offsets.extend(added)
+        self._index_signature = signature or self._signature()
+        header = self._index_header()
+        if header is None:
+            return
+        try:
+            with open(self.index_filename, 'r+b') as fh:
+                # another program may have saved a different index since
+                # ours, so only add to it if it's still the same
+                size = os.fstat(fh.fileno()).st_size
+                unchanged = (
+                    old_header is not None and
+                    fh.read(len(old_header)) == old_header and
+                    size == len(header) + 8 * (len(self._offsets) - len(added))
+                )
+                if unchanged:
+                    # write the offsets first, so that a crash in between
+                    # leaves a stale header and forces a rebuild
+                    fh.seek(0, os.SEEK_END)
+                    fh.write(added.tobytes())
+                    fh.seek(0)
+                    fh.write(header)
+        except OSError:
+            return
+        if not unchanged:
+            self._save_index()
+
+    def _check_rownum(self, rownum):
+        """Normalise a row number, raising IndexError if it's out of range"""
+
+        self._update_index()
+        count = len(self._offsets)
+        if rownum < 0:
+            rownum += count
+        if not 0 <= rownum < count:
+            raise IndexError('pipeline index out of range')
+        return rownum
+
+    @traced
     def get_pipeline(self, rownum):
         """Get a single pipeline by row number
 
@@ -71,28 +693,1132 @@ class CSVModel:
           in pipeline of a bad rownum.
         """
 
-        return self.get_all_pipelines()[rownum]
+        cached = self._rows is not None
+        if cached and self._rows_state() == self._rows_signature:
+            return dict(self._rows[rownum])
 
-    def save_pipeline(self, data, rownum=None):
-        """Save a dict of data to the CSV file"""
+        rownum = self._check_rownum(rownum)
+        self.check_fields(self._fieldnames)
+        journal = self._load_journal()
+        if rownum in journal:
+            return dict(journal[rownum])
 
-        if rownum is not None:
-            pipelines = self.get_all_pipelines()
-            pipelines[rownum] = data
-            with open(self.filename, 'w') as fh:
-                csvwriter = csv.DictWriter(fh,
-                                           fieldnames=self.fields.keys())
+        offsets = self._offsets
+
+        start = offsets[rownum]
+        if rownum + 1 < len(offsets):
+            end = offsets[rownum + 1]
+        elif self.compression is None:
+            end = self._index_signature[1]
+        else:
+            end = None
+
+        with open(self.filename, 'rb') as raw:
+            fh = self._reader(raw)
+            fh.seek(start)
+            text = fh.read(-1 if end is None else end - start)
+            text = text.decode(self.encoding)
+
+        # the file was replaced while we read it, e.g. compacted by
+        # another program, so the offsets may point anywhere
+        if self._signature() != self._index_signature:
+            return self.get_pipeline(rownum)
+
+        csvreader = csv.DictReader(io.StringIO(text, newline=''),
+                                   fieldnames=self._fieldnames)
+        pipeline = next(csvreader)
+        self._fix_bools([pipeline])
+
+        return pipeline
+
+    @contextmanager
+    def _locked(self):
+        """Hold the advisory lock on the file while saving to it
+
+        Writers take an exclusive flock() on a lock file next to the CSV,
+        which unlike the CSV is never replaced, waiting up to lock_timeout
+        seconds for other programs to finish. A model only takes the lock
+        once, so saves that compact don't wait on themselves. Nothing is
+        locked where fcntl isn't available.
+        """
+
+        if fcntl is None or self._lock_fd is not None:
+            yield
+            return
+
+        fd = os.open(self.lock_filename, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(
+                            f'{self.filename} is being saved by someone '
+                            f'else, try again')
+                    time.sleep(self.lock_interval)
+            self._lock_fd = fd
+            try:
+                yield
+            finally:
+                self._lock_fd = None
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+    def _append(self, filename, fieldnames, rows, header=False):
+        """Append rows to a CSV file with a single write
+
+        Readers and other writers then see either none of the rows or all
+        of them, never part of one. Rows appended to a compressed file are
+        compressed on their own and added as a new gzip member or xz
+        stream, which are read back as if the file were compressed whole.
+        """
+
+        buffer = io.StringIO(newline='')
+        csvwriter = csv.DictWriter(buffer, fieldnames=fieldnames)
+        if header:
+            csvwriter.writeheader()
+        csvwriter.writerows(rows)
+        text = buffer.getvalue().encode(self.encoding)
+        if self.compression is not None and filename == self.filename:
+            text = self.compression.compress(text)
+
+        fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            written = os.write(fd, text)
+            # a short write only happens on a full disk or a signal
+            while written < len(text):
+                written += os.write(fd, text[written:])
+        finally:
+            os.close(fd)
+
+    @traced
+    def save_pipeline(self, data, rownum=None, expected=None):
+        """Save a dict of data to the CSV file
+
+        New pipelines are appended to the file. Edits to an existing row
+        are appended to the journal, and the file is compacted once the
+        journal reaches journal_limit records.
+
+        Saves hold the file's lock, see _locked. If expected is given, an
+        edit is only saved if the row still matches it, e.g. the pipeline
+        as it was opened, and a ConflictError raised if someone else has
+        changed it since.
+        """
+
+        with self._locked():
+            if rownum is not None:
+                self._save_edit(data, rownum, expected)
+            else:
+                self._save_new(data)
+
+    def _save_edit(self, data, rownum, expected):
+        rownum = self._check_rownum(rownum)
+        self._load_journal()
+        if expected is not None and \
+                self._as_read(expected) != self._as_read(
+                    self.get_pipeline(rownum)):
+            raise ConflictError(
+                f'Pipeline {rownum} has been changed by someone else '
+                f'since it was opened')
+        cached = (
+            self._rows is not None and
+            self._rows_state() == self._rows_signature
+        )
+        tabled = (
+            self._table is not None and
+            self._rows_state() == self._table_signature
+        )
+
+        newjournal = self._journal_signature is None
+        self._append(self.journal_filename,
+                     ['row'] + list(self.fields.keys()),
+                     [dict(data, row=rownum)], header=newjournal)
+
+        row = self._as_read(data)
+        self._journal[rownum] = row
+        self._journal_records += 1
+        self._journal_signature = self._signature(self.journal_filename)
+        if cached:
+            self._rows[rownum] = dict(row)
+            self._rows_signature = self._rows_state()
+        if tabled:
+            self._table[rownum] = row
+            self._table_signature = self._rows_state()
+
+        if self._journal_records >= self.journal_limit:
+            self.compact()
+
+    def _save_new(self, data):
+        signature = self._signature()
+        newfile = signature is None
+        # the index of a compressed file is rebuilt when it's next needed
+        indexed = (
+            not newfile and
+            self.compression is None and
+            self._offsets is not None and
+            signature == self._index_signature
+        )
+        cached = (
+            self._rows is not None and
+            self._rows_state() == self._rows_signature
+        )
+        tabled = (
+            self._table is not None and
+            self._rows_state() == self._table_signature
+        )
+
+        self._append(self.filename, self.fields.keys(), [data],
+                     header=newfile)
+
+        # the new row starts where the file used to end
+        if indexed:
+            self._append_index([signature[1]])
+        if newfile:
+            self._rows = []
+            cached = True
+        if cached:
+            self._rows.append(self._as_read(data))
+            self._rows_signature = self._rows_state()
+        if tabled:
+            self._table.append(self._as_read(data))
+            self._table_signature = self._rows_state()
+
+    @traced
+    def compact(self):
+        """Merge the journal into the CSV file
+
+        The merged rows are written to a temporary file which replaces the
+        original once it is safely on disk, so a crash can't truncate it.
+        The file's lock is held throughout, see _locked.
+        """
+
+        with self._locked():
+            self._compact()
+
+    def _compact(self):
+        if self._signature(self.journal_filename) is None:
+            return
+
+        # the parsed rows are only kept if they were cached already
+        cached = self._rows is not None
+        tabled = (
+            self._table is not None and
+            self._rows_state() == self._table_signature
+        )
+        pipelines = self.get_all_pipelines()
+        self._update_index()
+        fieldnames = self._fieldnames or list(self.fields.keys())
+
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        fd, tempname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with open(fd, 'wb') as raw, self._text(raw, 'w') as fh:
+                csvwriter = csv.DictWriter(fh, fieldnames=fieldnames)
                 csvwriter.writeheader()
                 csvwriter.writerows(pipelines)
+            # a compressed file is only complete once it's closed
+            fd = os.open(tempname, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            shutil.copymode(self.filename, tempname)
+            os.replace(tempname, self.filename)
+        except BaseException:
+            os.remove(tempname)
+            raise
+        os.remove(self.journal_filename)
+
+        # every row may have moved, but the merged rows are unchanged
+        self._offsets = None
+        self._journal = {}
+        self._journal_signature = None
+        self._journal_records = 0
+        self._rows_signature = self._rows_state()
+        if not cached:
+            self._rows = None
+        if tabled:
+            self._table_signature = self._rows_state()
+
+
+def _format_number(value):
+    """Format a float as short text, without a trailing .0"""
+
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
+def _array_differences(old, new, count, block=4096):
+    """Get the indexes below count at which two arrays differ
+
+    Blocks of the arrays are compared as bytes, so unchanged stretches are
+    skipped quickly and NaNs compare equal to themselves.
+    """
+
+    size = old.itemsize
+    oldbytes = old[:count].tobytes()
+    newbytes = new[:count].tobytes()
+    if oldbytes == newbytes:
+        return []
+    differences = []
+    for start in range(0, count * size, block * size):
+        stop = start + block * size
+        if oldbytes[start:stop] == newbytes[start:stop]:
+            continue
+        for index in range(start, min(stop, count * size), size):
+            if oldbytes[index:index + size] != newbytes[index:index + size]:
+                differences.append(index // size)
+    return differences
+
+
+class _NumberColumn:
+    """A column of numbers stored as doubles
+
+    Each value's text is kept as either the short or the repr form of the
+    number, e.g. '3' or '3.0', so rows read back exactly as they were
+    written. Blank values are NaN, and any other text is kept as it is by
+    row number.
+    """
+
+    __slots__ = ('data', 'styles', 'text')
+
+    # how the text of a value is formed from its number
+    short, long, other = 0, 1, 2
 
+    def __init__(self):
+        self.data = array('d')
+        self.styles = array('b')
+        self.text = {}
+
+    def _parse(self, rownum, value):
+        """Get the (number, style) of a value, keeping any other text"""
+
+        self.text.pop(rownum, None)
+        if value is None or value == '':
+            return float('nan'), self.short
+        text = str(value)
+        try:
+            number = float(text)
+        except ValueError:
+            number = float('nan')
+        if number == number:
+            if text == _format_number(number):
+                return number, self.short
+            if text == repr(number):
+                return number, self.long
+        self.text[rownum] = text
+        return number, self.other
+
+    def append(self, value):
+        number, style = self._parse(len(self.data), value)
+        self.data.append(number)
+        self.styles.append(style)
+
+    def extend(self, values):
+        # most columns repeat a few values, so each is only parsed once
+        parsed = {}
+        start = len(self.data)
+        numbers = []
+        styles = []
+        for rownum, value in enumerate(values, start):
+            if value in parsed:
+                number, style = parsed[value]
+                if style == self.other:
+                    self.text[rownum] = str(value)
+            else:
+                number, style = parsed[value] = self._parse(rownum, value)
+            numbers.append(number)
+            styles.append(style)
+        self.data.extend(numbers)
+        self.styles.extend(styles)
+
+    def set(self, rownum, value):
+        self.data[rownum], self.styles[rownum] = self._parse(rownum, value)
+
+    def get(self, rownum):
+        style = self.styles[rownum]
+        if style == self.short:
+            number = self.data[rownum]
+            return '' if number != number else _format_number(number)
+        if style == self.long:
+            return repr(self.data[rownum])
+        return self.text[rownum]
+
+    def values(self):
+        """Get the column as floats, with text for anything else"""
+
+        return [
+            self.get(rownum) if number != number else number
+            for rownum, number in enumerate(self.data)
+        ]
+
+    def extend_column(self, other):
+        start = len(self.data)
+        self.data.extend(other.data)
+        self.styles.extend(other.styles)
+        for rownum, text in other.text.items():
+            self.text[start + rownum] = text
+
+    def copy(self):
+        column = _NumberColumn()
+        column.data = array('d', self.data)
+        column.styles = array('b', self.styles)
+        column.text = dict(self.text)
+        return column
+
+    def differences(self, other, count):
+        differences = set(_array_differences(other.data, self.data, count))
+        differences.update(
+            _array_differences(other.styles, self.styles, count))
+        differences.update(
+            rownum for rownum in set(self.text) | set(other.text)
+            if rownum < count and
+            self.text.get(rownum) != other.text.get(rownum)
+        )
+        return differences
+
+
+class _StringColumn:
+    """A dictionary-encoded column of strings
+
+    Each distinct value is stored once, and rows hold its code.
+    """
+
+    __slots__ = ('codes', 'strings', 'lookup')
+
+    def __init__(self):
+        self.codes = array('I')
+        self.strings = []
+        self.lookup = {}
+
+    def _encode(self, value):
+        if value is None:
+            value = ''
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.lookup[value] = code
+        return code
+
+    def append(self, value):
+        self.codes.append(self._encode(value))
+
+    def extend(self, values):
+        lookup = self.lookup
+        self.codes.extend(
+            lookup[value] if value in lookup else self._encode(value)
+            for value in values
+        )
+
+    def set(self, rownum, value):
+        self.codes[rownum] = self._encode(value)
+
+    def get(self, rownum):
+        return self.strings[self.codes[rownum]]
+
+    def values(self):
+        strings = self.strings
+        return [strings[code] for code in self.codes]
+
+    def extend_column(self, other):
+        codes = [self._encode(value) for value in other.strings]
+        self.codes.extend([codes[code] for code in other.codes])
+
+    def copy(self):
+        column = _StringColumn()
+        column.codes = array('I', self.codes)
+        column.strings = list(self.strings)
+        column.lookup = dict(self.lookup)
+        return column
+
+    def differences(self, other, count):
+        # codes only mean the same thing if one table's strings extend
+        # the other's, as they do for a copy
+        shared = min(len(self.strings), len(other.strings))
+        if self.strings[:shared] == other.strings[:shared]:
+            return set(_array_differences(other.codes, self.codes, count))
+        values = self.values()
+        others = other.values()
+        return {
+            rownum for rownum in range(count)
+            if values[rownum] != others[rownum]
+        }
+
+
+class PipelineRow(Mapping):
+    """A read-only view of one row of a PipelineTable
+
+    Values are text, like the dicts from CSVModel.get_all_pipelines.
+    """
+
+    __slots__ = ('table', 'rownum')
+
+    def __init__(self, table, rownum):
+        self.table = table
+        self.rownum = rownum
+
+    def __getitem__(self, key):
+        return self.table.columns[key].get(self.rownum)
+
+    def __iter__(self):
+        return iter(self.table.columns)
+
+    def __len__(self):
+        return len(self.table.columns)
+
+    def __repr__(self):
+        return f'PipelineRow({dict(self)!r})'
+
+
+class PipelineTable:
+    """A compact in-memory table of pipelines, stored column by column
+
+    Numeric fields are kept in arrays of doubles and the other fields are
+    dictionary-encoded, so repeated values like a Project are stored once.
+    Indexing gives PipelineRow views, which can be used wherever a
+    pipeline dict is read.
+    """
+
+    numeric_types = (FT.decimal, FT.integer)
+
+    def __init__(self, fields=None):
+        self.fields = fields or CSVModel.fields
+        self.columns = {
+            key: _NumberColumn() if meta['type'] in self.numeric_types
+            else _StringColumn()
+            for key, meta in self.fields.items()
+        }
+        self.count = 0
+
+    @classmethod
+    def from_pipelines(cls, pipelines, fields=None):
+        """Make a table from an iterable of pipeline dicts"""
+
+        table = cls(fields)
+        table.extend(pipelines)
+        return table
+
+    def __len__(self):
+        return self.count
+
+    def _check_rownum(self, rownum):
+        if rownum < 0:
+            rownum += self.count
+        if not 0 <= rownum < self.count:
+            raise IndexError('pipeline index out of range')
+        return rownum
+
+    def __getitem__(self, rownum):
+        return PipelineRow(self, self._check_rownum(rownum))
+
+    def __setitem__(self, rownum, data):
+        rownum = self._check_rownum(rownum)
+        for key, column in self.columns.items():
+            column.set(rownum, data.get(key))
+
+    def __iter__(self):
+        for rownum in range(self.count):
+            yield PipelineRow(self, rownum)
+
+    def append(self, data):
+        for key, column in self.columns.items():
+            column.append(data.get(key))
+        self.count += 1
+
+    def extend(self, pipelines):
+        pipelines = list(pipelines)
+        for key, column in self.columns.items():
+            column.extend([data.get(key) for data in pipelines])
+        self.count += len(pipelines)
+
+    def extend_table(self, other):
+        """Add the rows of another table with the same fields"""
+
+        for key, column in self.columns.items():
+            column.extend_column(other.columns[key])
+        self.count += other.count
+
+    def column(self, key):
+        """Get a column as a list, with floats for the numeric fields"""
+
+        return self.columns[key].values()
+
+    def copy(self):
+        table = PipelineTable(self.fields)
+        table.columns = {
+            key: column.copy() for key, column in self.columns.items()
+        }
+        table.count = self.count
+        return table
+
+    def changed(self, other):
+        """Get the sorted row numbers whose values differ from another table
+
+        Only rows in both tables are compared.
+        """
+
+        count = min(self.count, other.count)
+        changed = set()
+        for key, column in self.columns.items():
+            changed.update(column.differences(other.columns[key], count))
+        return sorted(changed)
+
+
+def _scan_csv(filename):
+    """Get the manifest entry of a CSV file: signature, rows and header
+
+    Module level so it can run in a worker process.
+    """
+
+    model = CSVModel(filename)
+    signature = model._signature()
+    try:
+        # compressed files are decompressed as the header is read
+        with model.open_text() as fh:
+            fields = next(csv.reader(fh), [])
+        # only index WTGUI-format files
+        if not set(CSVModel.fields) <= set(fields):
+            return {'signature': signature, 'rows': 0, 'fields': fields}
+        model._update_index()
+    except (OSError, EOFError, lzma.LZMAError, UnicodeDecodeError,
+            csv.Error):
+        return {'signature': signature, 'rows': 0, 'fields': []}
+    return {
+        'signature': model._index_signature,
+        'rows': len(model._offsets),
+        'fields': model._fieldnames or []
+    }
+
+
+def _read_csv_table(filename):
+    """Read a CSV file's manifest entry and PipelineTable
+
+    Returns (entry, table, table signature), with no table if the file
+    isn't a WTGUI-format CSV. Module level so it can run in a worker
+    process.
+    """
+
+    entry = _scan_csv(filename)
+    if not set(CSVModel.fields) <= set(entry['fields']):
+        return entry, None, None
+    model = CSVModel(filename)
+    table = model.get_table()
+    return entry, table, model._table_signature
+
+
+class WorkspaceModel:
+    """Every WTGUI-format CSV file in a directory, as one set of pipelines
+
+    Files are ordered by name, so the daily wt_data_{date}.csv files run
+    oldest to newest, and row numbers run on from one file to the next.
+    Compressed .csv.gz and .csv.xz files, such as archived days, are
+    included. New pipelines are saved to today's file.
+
+    A manifest in the directory caches each file's signature, row count
+    and header, so only new or changed files are read to find out which
+    file a row is in. Files are read in parallel across worker processes.
+    """
+
+    manifest_name = '.wt_manifest.json'
+    patterns = ('*.csv', '*.csv.gz', '*.csv.xz')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fields = CSVModel.fields
+        self.manifest_filename = os.path.join(filename, self.manifest_name)
+        self.models = {}
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_filename, 'r') as fh:
+                manifest = json.loads(fh.read())
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+    def _save_manifest(self):
+        """Write the manifest, which is only a cache, if possible"""
+
+        try:
+            fd, tempname = tempfile.mkstemp(dir=self.filename,
+                                            suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with open(fd, 'w') as fh:
+                fh.write(json.dumps(self.manifest))
+            os.replace(tempname, self.manifest_filename)
+        except OSError:
+            os.remove(tempname)
+
+    def _model(self, filename):
+        if filename not in self.models:
+            self.models[filename] = CSVModel(filename)
+        return self.models[filename]
+
+    def _map(self, func, filenames):
+        """Yield (filename, func(filename)) as each finishes
+
+        Several files are shared across a pool of worker processes, which
+        are spawned rather than forked, since the caller may have threads
+        running, such as the application's TaskRunner.
+        """
+
+        if len(filenames) < 2:
+            for filename in filenames:
+                yield filename, func(filename)
+            return
+        workers = min(len(filenames), os.cpu_count() or 1)
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            futures = {
+                executor.submit(func, filename): filename
+                for filename in filenames
+            }
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _table_cached(self, filename):
+        model = self._model(filename)
+        return (
+            model._table is not None and
+            model._table_signature == model._rows_state()
+        )
+
+    def _stale(self, filenames):
+        """Get the files whose manifest entries don't match the disk"""
+
+        stale = []
+        for filename in filenames:
+            entry = self.manifest.get(os.path.basename(filename))
+            signature = self._model(filename)._signature()
+            if not entry or entry['signature'] != signature:
+                stale.append(filename)
+        return stale
+
+    def files(self, read=None):
+        """Get the WTGUI-format CSV files in the directory, in order
+
+        Out of date manifest entries are refreshed. Read is an optional
+        function called with the stale files, which returns their new
+        entries instead of them being scanned.
+        """
+
+        directory = glob.escape(self.filename)
+        filenames = sorted(
+            filename for pattern in self.patterns
+            for filename in glob.glob(os.path.join(directory, pattern)))
+        stale = self._stale(filenames)
+        if stale:
+            entries = read(stale) if read else dict(
+                self._map(_scan_csv, stale))
+            for filename, entry in entries.items():
+                self.manifest[os.path.basename(filename)] = entry
+        names = {os.path.basename(filename) for filename in filenames}
+        if stale or set(self.manifest) - names:
+            self.manifest = {
+                name: entry for name, entry in self.manifest.items()
+                if name in names
+            }
+            self._save_manifest()
+
+        required = set(self.fields)
+        return [
+            filename for filename in filenames
+            if required <= set(
+                self.manifest[os.path.basename(filename)]['fields'])
+        ]
+
+    def _locate(self, rownum):
+        """Get the (file, row number in that file) of a row"""
+
+        files = self.files()
+        counts = [
+            self.manifest[os.path.basename(filename)]['rows']
+            for filename in files
+        ]
+        if rownum < 0:
+            rownum += sum(counts)
+        if rownum >= 0:
+            for filename, count in zip(files, counts):
+                if rownum < count:
+                    return filename, rownum
+                rownum -= count
+        raise IndexError('pipeline index out of range')
+
+    @traced
+    def get_table(self, progress=None):
+        """Get the pipelines of every file as one PipelineTable
+
+        Files whose tables aren't already cached by their CSVModel are
+        read in parallel. Progress is called with the number of rows read
+        so far as each file finishes.
+        """
+
+        tables = {}
+        read = []
+
+        def read_files(stale):
+            # files changed by our own saves only need their index checked
+            entries = {
+                filename: _scan_csv(filename) for filename in stale
+                if self._table_cached(filename)
+            }
+            stale = [
+                filename for filename in stale if filename not in entries
+            ]
+            for filename, result in self._map(_read_csv_table, stale):
+                entry, table, signature = result
+                entries[filename] = entry
+                if table is not None:
+                    model = self._model(filename)
+                    model._table = table
+                    model._table_signature = signature
+                    tables[filename] = table
+                    read.append(len(table))
+                    if progress:
+                        progress(sum(read))
+            return entries
+
+        files = self.files(read=read_files)
+        read_files([
+            filename for filename in files
+            if filename not in tables and not self._table_cached(filename)
+        ])
+
+        table = PipelineTable(self.fields)
+        for filename in files:
+            if filename in tables:
+                table.extend_table(tables[filename])
+            else:
+                table.extend_table(self._model(filename).get_table())
+        return table
+
+    @traced
+    def get_all_pipelines(self, progress=None):
+        """Get the pipelines of every file as one list of dicts"""
+
+        pipelines = []
+        for filename in self.files():
+            pipelines.extend(self._model(filename).get_all_pipelines())
+            if progress:
+                progress(len(pipelines))
+        return pipelines
+
+    def iter_pipelines(self, fields=None, typed=True):
+        """Iterate over the pipelines of every file in turn
+
+        See CSVModel.iter_pipelines, which reads each file.
+        """
+
+        for filename in self.files():
+            yield from self._model(filename).iter_pipelines(fields, typed)
+
+    @traced
+    def get_pipeline(self, rownum):
+        filename, rownum = self._locate(rownum)
+        return self._model(filename).get_pipeline(rownum)
+
+    @traced
+    def save_pipeline(self, data, rownum=None, expected=None):
+        """Save a dict of data to the file it belongs in
+
+        New pipelines are appended to today's wt_data_{date}.csv file.
+        Expected is checked as in CSVModel.save_pipeline.
+        """
+
+        if rownum is None:
+            datestring = date.today().isoformat()
+            filename = os.path.join(self.filename, f'wt_data_{datestring}.csv')
         else:
-            newfile = not os.path.exists(self.filename)
+            filename, rownum = self._locate(rownum)
+        self._model(filename).save_pipeline(data, rownum, expected)
+
+    @traced
+    def compact(self):
+        """Merge the journal into each file that has one"""
+
+        for filename in self.files():
+            self._model(filename).compact()
+
+
+class SQLiteModel:
+    """SQLite database storage
+
+    Provides the same interface as CSVModel, with the schema generated
+    from CSVModel.fields. Row numbers count from 0 in insertion order.
 
-            with open(self.filename, 'a') as fh:
-                csvwriter = csv.DictWriter(fh, fieldnames=self.fields.keys())
-                if newfile:
-                    csvwriter.writeheader()
-                csvwriter.writerow(data)
+    Decimal fields are stored as REAL so they can be compared and sorted
+    as numbers, which means their text isn't kept: '273.10' is read back
+    as 273.1 and '3' as 3.0.
+    """
+
+    fields = CSVModel.fields
+
+    sql_types = {
+        FT.string: 'TEXT',
+        FT.string_list: 'TEXT',
+        FT.iso_date_string: 'TEXT',
+        FT.long_string: 'TEXT',
+        FT.decimal: 'REAL',
+        FT.integer: 'INTEGER',
+        FT.boolean: 'INTEGER'
+    }
+    indexed_fields = ('Project', 'Pipeline', 'Originator', 'Date')
+
+    def __init__(self, filename):
+        self.filename = filename
+        # the connection is shared with the application's worker thread,
+        # which never uses it at the same time as the main thread
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.columns = ', '.join(f'"{key}"' for key in self.fields.keys())
+        self.create_schema()
+
+    def create_schema(self):
+        """Create the pipelines table and its indexes if they don't exist"""
+
+        columns = ', '.join(
+            '"{}" {}'.format(key, self.sql_types[meta['type']])
+            for key, meta in self.fields.items()
+        )
+        with self.connection:
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS pipelines '
+                f'(id INTEGER PRIMARY KEY, {columns})'
+            )
+            for key in self.indexed_fields:
+                self.connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS "pipelines_{key}" '
+                    f'ON pipelines ("{key}")'
+                )
+
+    def _to_sql(self, data):
+        """Convert a dict of data to a tuple of column values"""
+
+        values = []
+        for key, meta in self.fields.items():
+            value = data.get(key)
+            if value == '':
+                value = None
+            elif meta['type'] == FT.boolean and isinstance(value, str):
+                value = value.lower() in ('true', 'yes', '1')
+            values.append(value)
+        return tuple(values)
+
+    def _from_sql(self, row):
+        """Convert a database row to a dict like CSVModel's"""
+
+        pipeline = {}
+        for key, meta in self.fields.items():
+            value = row[key]
+            if meta['type'] == FT.boolean:
+                value = bool(value)
+            elif value is None:
+                value = ''
+            pipeline[key] = value
+        return pipeline
+
+    def count(self):
+        """Get the number of pipelines in the database"""
+
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM pipelines').fetchone()[0]
+
+    @traced
+    def query(self, filters=None, offset=0, limit=None):
+        """Get a page of pipelines matching the filters
+
+        Filters is a dict of field names to values that must match
+        exactly. Returns a list of (rownum, pipeline dict) tuples.
+        """
+
+        filters = filters or {}
+        for key in filters:
+            if key not in self.fields:
+                raise ValueError(f'Unknown field: {key}')
+        where = ' AND '.join(f'"{key}" = ?' for key in filters)
+        sql = f'SELECT id, {self.columns} FROM pipelines'
+        if where:
+            sql += f' WHERE {where}'
+        sql += ' ORDER BY id LIMIT ? OFFSET ?'
+        params = tuple(filters.values()) + (
+            -1 if limit is None else limit, offset)
+        return [
+            (row['id'] - 1, self._from_sql(row))
+            for row in self.connection.execute(sql, params)
+        ]
+
+    @traced
+    def get_all_pipelines(self, progress=None):
+        pipelines = []
+        cursor = self.connection.execute(
+            f'SELECT {self.columns} FROM pipelines ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(CSVModel.progress_interval)
+            if not rows:
+                break
+            pipelines.extend(self._from_sql(row) for row in rows)
+            if progress:
+                progress(len(pipelines))
+        return pipelines
+
+    @traced
+    def get_table(self, progress=None):
+        """Get all pipelines as a PipelineTable, see CSVModel.get_table"""
+
+        table = PipelineTable(self.fields)
+        pipelines = self.iter_pipelines(typed=False)
+        while True:
+            chunk = list(islice(pipelines, CSVModel.progress_interval))
+            if not chunk:
+                break
+            table.extend(chunk)
+            if progress:
+                progress(len(table))
+        return table
+
+    def iter_pipelines(self, fields=None, typed=True):
+        """Iterate over the pipelines as dicts of typed values
+
+        See CSVModel.iter_pipelines. Rows are fetched from the database as
+        they're needed.
+        """
+
+        fieldconverters = _converters(self.fields, fields or self.fields,
+                                      typed)
+        columns = ', '.join(f'"{key}"' for key, converter in fieldconverters)
+        cursor = self.connection.execute(
+            f'SELECT {columns} FROM pipelines ORDER BY id')
+        for rownum, row in enumerate(cursor):
+            record = ['' if value is None else str(value) for value in row]
+            yield _typed(record, fieldconverters, rownum)
+
+    @traced
+    def get_pipeline(self, rownum):
+        """Get a single pipeline by row number
+
+        Callling code should catch IndexError
+          in pipeline of a bad rownum.
+        """
+
+        if rownum < 0:
+            rownum += self.count()
+        row = self.connection.execute(
+            f'SELECT {self.columns} FROM pipelines WHERE id = ?',
+            (rownum + 1,)
+        ).fetchone()
+        if rownum < 0 or row is None:
+            raise IndexError('pipeline index out of range')
+        return self._from_sql(row)
+
+    @traced
+    def save_pipeline(self, data, rownum=None, expected=None):
+        """Save a dict of data to the database
+
+        If expected is given, an edit is only saved if the row still
+        matches it, see CSVModel.save_pipeline.
+        """
+
+        values = self._to_sql(data)
+        if rownum is not None:
+            if rownum < 0:
+                rownum += self.count()
+            assignments = ', '.join(f'"{key}" = ?' for key in self.fields)
+            with self.connection:
+                if expected is not None:
+                    # hold the write lock between the check and the update
+                    self.connection.execute('BEGIN IMMEDIATE')
+                    row = self.connection.execute(
+                        f'SELECT {self.columns} FROM pipelines WHERE id = ?',
+                        (rownum + 1,)
+                    ).fetchone()
+                    if row is not None and self._to_sql(expected) != \
+                            self._to_sql(self._from_sql(row)):
+                        raise ConflictError(
+                            f'Pipeline {rownum} has been changed by someone '
+                            f'else since it was opened')
+                cursor = self.connection.execute(
+                    f'UPDATE pipelines SET {assignments} WHERE id = ?',
+                    values + (rownum + 1,)
+                )
+            if rownum < 0 or cursor.rowcount == 0:
+                raise IndexError('pipeline index out of range')
+        else:
+            placeholders = ', '.join('?' for key in self.fields)
+            with self.connection:
+                self.connection.execute(
+                    f'INSERT INTO pipelines ({self.columns}) '
+                    f'VALUES ({placeholders})',
+                    values
+                )
+
+    @traced
+    def import_csv(self, filename):
+        """Append every row of a WTGUI-format CSV file in one transaction
+
+        Each row is validated against the fields, and nothing is imported
+        if any are invalid; a ValueError describes the first bad value.
+        The file may be compressed, as for CSVModel. Returns the number of
+        rows imported.
+        """
+
+        validator = Validator(self.fields)
+
+        def rows(csvreader):
+            for rownum, row in enumerate(csvreader):
+                validator.check(row, rownum)
+                yield self._to_sql(row)
+
+        placeholders = ', '.join('?' for key in self.fields)
+        with CSVModel(filename).open_text() as fh:
+            csvreader = csv.DictReader(fh)
+            CSVModel.check_fields(csvreader.fieldnames)
+            with self.connection:
+                cursor = self.connection.executemany(
+                    f'INSERT INTO pipelines ({self.columns}) '
+                    f'VALUES ({placeholders})',
+                    rows(csvreader)
+                )
+        return cursor.rowcount
+
+    @traced
+    def export_csv(self, filename):
+        """Write every pipeline to a WTGUI-format CSV file
+
+        Decimal fields are written as the stored floats, so they may not
+        match the text that was imported, e.g. '3' is exported as '3.0'.
+        Returns the number of rows exported.
+        """
+
+        count = 0
+        with open(filename, 'w', newline='') as fh:
+            csvwriter = csv.DictWriter(fh, fieldnames=self.fields.keys())
+            csvwriter.writeheader()
+            # a single select reads from one consistent snapshot
+            for row in self.connection.execute(
+                    f'SELECT {self.columns} FROM pipelines ORDER BY id'):
+                csvwriter.writerow(self._from_sql(row))
+                count += 1
+        return count
+
+    @traced
+    def compact(self):
+        """Rebuild the database file to reclaim unused space"""
+
+        self.connection.execute('VACUUM')
 
 
 class SettingsModel:
@@ -100,13 +1826,17 @@ class SettingsModel:
 
     variables = {
         'autofill date': {'type': 'bool', 'value': True},
-        'autofill sheet data': {'type': 'bool', 'value': True}
+        'autofill sheet data': {'type': 'bool', 'value': True},
+        'record timings': {'type': 'bool', 'value': False}
     }
 
     def __init__(self, filename='wt_settings.json', path='~'):
         # determine the file path
         self.filepath = os.path.join(os.path.expanduser(path), filename)
 
+        # the settings as last read or written, to skip unchanged saves
+        self._saved = None
+
         # load in saved values
         self.load()
 
@@ -121,10 +1851,34 @@ class SettingsModel:
             raise ValueError("Bad key or wrong variable type")
 
     def save(self):
-        """Save the current settings to the file"""
+        """Save the current settings to the file
+
+        Nothing is written if the settings haven't changed since they were
+        loaded or last saved. Otherwise they're written to a temporary
+        file which replaces the old one, so it's never left half written.
+        Returns True if the file was written.
+        """
+
         json_string = json.dumps(self.variables)
-        with open(self.filepath, 'w') as fh:
-            fh.write(json_string)
+        if json_string == self._saved:
+            return False
+
+        dirname = os.path.dirname(self.filepath)
+        fd, tempname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with open(fd, 'w') as fh:
+                fh.write(json_string)
+                fh.flush()
+                os.fsync(fh.fileno())
+            # keep the old file's permissions rather than mkstemp's 0600
+            if os.path.exists(self.filepath):
+                shutil.copymode(self.filepath, tempname)
+            os.replace(tempname, self.filepath)
+        except BaseException:
+            os.remove(tempname)
+            raise
+        self._saved = json_string
+        return True
 
     def load(self):
         """Load the settings from the file"""
@@ -143,3 +1897,4 @@ class SettingsModel:
             if key in raw_values and 'value' in raw_values[key]:
                 raw_value = raw_values[key]['value']
                 self.variables[key]['value'] = raw_value
+        self._saved = json.dumps(self.variables)
@@ -1,2 +1,164 @@
+import numpy as np
+
+
+DESIGN_FACTOR = 0.72
+
+
+def _column(values, default=0.):
+    """Convert a column of CSV values to a float array
+
+    Empty strings (unset optional fields) are replaced with the default.
+    """
+
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    if np.ndim(values) == 0:
+        values = default if values in ('', None) else values
+        return np.asarray(values, dtype=float)
+    return np.array(
+        [default if value in ('', None) else value for value in values],
+        dtype=float
+    )
+
+
+def calc_wallthick_array(d, p, smys, t_cor=0., tol=0., b=0., t_sel=None):
+    """Calculate the required wall thickness for arrays of pipelines
+
+    Args:
+      d - outside diameter [mm]
+      p - design pressure, in units consistent with smys
+      smys - specified minimum yield strength
+      t_cor - corrosion allowance [mm]
+      tol - mill tolerance [%]
+      b - bend thinning [%]
+      t_sel - selected wall thickness [mm], optional
+
+    All arguments may be scalars or array-likes and are broadcast against
+    each other. Returns a tuple of (required thickness, utilisation) arrays;
+    utilisation is the ratio of required to selected thickness and is None
+    when t_sel is not given. Pipelines with a blank d, p or smys, or an
+    SMYS that isn't positive, get NaN results.
+    """
+
+    d = _column(d, default=np.nan)
+    p = _column(p, default=np.nan)
+    smys = _column(smys, default=np.nan)
+    t_cor = _column(t_cor)
+    tol = _column(tol)
+    b = _column(b)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_press = np.where(smys > 0, p * d / DESIGN_FACTOR / smys, np.nan)
+    t_req = (t_press + t_cor) / ((1 - tol / 100) * (1 - b / 100))
+
+    if t_sel is None:
+        return t_req, None
+
+    t_sel = _column(t_sel, default=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        util = np.where(t_sel > 0, t_req / t_sel, np.nan)
+    return t_req, util
+
+
+def calc_wallthick_table(table, p):
+    """Calculate required thickness and utilisation for a table of pipelines
+
+    The table maps CSVModel field names to column sequences, as read from a
+    WTGUI-format CSV file; p is the design pressure (scalar or column).
+    """
+
+    return calc_wallthick_array(
+        table['D_o'], p, table['SMYS'],
+        t_cor=table.get('t_cor', 0.),
+        tol=table.get('tol', 0.),
+        b=table.get('B', 0.),
+        t_sel=table.get('t_sel')
+    )
+
+
 def calc_wallthick(d, p, smys):
-    return p * d / 0.72 / smys
+    """Calculate the required wall thickness of a single pipeline
+
+    A thin wrapper around calc_wallthick_array, which raises an exception
+    for blank values or a zero SMYS instead of returning NaN.
+    """
+
+    d, p, smys = float(d), float(p), float(smys)
+    if smys == 0:
+        raise ZeroDivisionError('float division by zero')
+    t_req, _ = calc_wallthick_array(d, p, smys)
+    return float(t_req)
+
+
+class SweepResult:
+    """The results of a parametric sweep over a grid of inputs
+
+    Behaves as a read-only sequence of row dicts, one per grid point, which
+    are only built when accessed. The full columns are in self.columns.
+    """
+
+    result_fields = ('t_req', 'util')
+
+    def __init__(self, axes, t_req, util):
+        self.axes = axes
+        self.shape = tuple(len(values) for values in axes.values())
+        self.size = int(np.prod(self.shape))
+        grids = np.meshgrid(*axes.values(), indexing='ij', sparse=True)
+        self.columns = {
+            name: np.broadcast_to(grid, self.shape).ravel()
+            for name, grid in zip(axes.keys(), grids)
+        }
+        self.columns['t_req'] = np.broadcast_to(t_req, self.shape).ravel()
+        if util is None:
+            util = np.full(self.shape, np.nan)
+        self.columns['util'] = np.broadcast_to(util, self.shape).ravel()
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        """Get a column of the results as a list, blank if not swept"""
+
+        if name not in self.columns:
+            return [''] * self.size
+        return self.columns[name].tolist()
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('sweep index out of range')
+        return {
+            name: column[index].item()
+            for name, column in self.columns.items()
+        }
+
+
+def calc_sweep(ranges):
+    """Evaluate the calculation over the Cartesian grid of input ranges
+
+    Ranges maps input names (CSVModel field names, plus 'p' for the design
+    pressure) to a scalar or a 1-D sequence of values. D_o, p and SMYS are
+    required. Each input is given its own axis of the grid, so the whole
+    grid is calculated in one broadcast pass.
+    """
+
+    axes = {
+        name: np.atleast_1d(_column(values)).ravel()
+        for name, values in ranges.items()
+    }
+    ndim = len(axes)
+    shaped = {}
+    for axis, (name, values) in enumerate(axes.items()):
+        shape = [1] * ndim
+        shape[axis] = len(values)
+        shaped[name] = values.reshape(shape)
+
+    t_req, util = calc_wallthick_array(
+        shaped['D_o'], shaped['p'], shaped['SMYS'],
+        t_cor=shaped.get('t_cor', 0.),
+        tol=shaped.get('tol', 0.),
+        b=shaped.get('B', 0.),
+        t_sel=shaped.get('t_sel')
+    )
+    return SweepResult(axes, t_req, util)
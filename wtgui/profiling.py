@@ -0,0 +1,100 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class Tracer:
+    """Records timing spans for application callbacks and model calls
+
+    Functions decorated with traced() only check the enabled flag when
+    tracing is off. When it's on, each call records a span with its start
+    time, duration and, for results with a length, the number of rows.
+    """
+
+    # spans kept before the oldest are dropped
+    maxspans = 100000
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = deque(maxlen=self.maxspans)
+        self.epoch = time.perf_counter()
+
+    @property
+    def last(self):
+        """The most recently finished span, or None"""
+
+        return self.spans[-1] if self.spans else None
+
+    def record(self, name, start, duration, rows=None):
+        self.spans.append({
+            'name': name,
+            'start': start - self.epoch,
+            'duration': duration,
+            'rows': rows,
+            'thread': threading.current_thread().name
+        })
+
+    def traced(self, func):
+        """Decorator recording a span for each call while tracing is on"""
+
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                duration = time.perf_counter() - start
+                rows = None
+                if (hasattr(result, '__len__') and
+                        not isinstance(result, (str, dict))):
+                    rows = len(result)
+                self.record(name, start, duration, rows)
+
+        return wrapper
+
+    def clear(self):
+        self.spans.clear()
+
+    def dump(self, filename):
+        """Write the spans to a file
+
+        Files ending in .jsonl get one JSON object per span, anything else
+        gets the Chrome trace event format, which can be loaded in
+        chrome://tracing or Perfetto.
+        """
+
+        spans = list(self.spans)
+        with open(filename, 'w') as fh:
+            if filename.endswith('.jsonl'):
+                for span in spans:
+                    fh.write(json.dumps(span) + '\n')
+                return
+
+            pid = os.getpid()
+            events = [
+                {
+                    'name': span['name'],
+                    'ph': 'X',
+                    'ts': span['start'] * 1e6,
+                    'dur': span['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': span['thread'],
+                    'args': {'rows': span['rows']}
+                }
+                for span in spans
+            ]
+            fh.write(json.dumps({'traceEvents': events}))
+
+
+# the application-wide tracer
+tracer = Tracer()
+traced = tracer.traced
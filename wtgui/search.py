@@ -0,0 +1,191 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+class PrefixIndex:
+    """A sorted index of case-folded words for incremental prefix search
+
+    Each row is indexed under every word of its indexed fields, as well as
+    their full values, so a search for 'north' or 'north se' matches a
+    Project of 'North Sea'.
+    """
+
+    # the last character, used as the upper bound of a prefix range
+    end = '\U0010ffff'
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.entries = []
+
+    def tokens(self, row):
+        """Get the set of index words for a row"""
+
+        return self._tokens(row.get(key, '') for key in self.fields)
+
+    def _tokens(self, values):
+        tokens = set()
+        for value in values:
+            value = str(value).casefold()
+            if value:
+                tokens.add(value)
+                tokens.update(re.findall(r'\w+', value))
+        return tokens
+
+    def build(self, rows):
+        """Index a sequence of rows by their row numbers
+
+        Rows may also be a models.PipelineTable, which is read by column.
+        """
+
+        if hasattr(rows, 'column'):
+            records = zip(*[rows.column(key) for key in self.fields])
+        else:
+            records = (
+                [row.get(key, '') for key in self.fields] for row in rows)
+        self.entries = sorted(
+            (token, rownum)
+            for rownum, values in enumerate(records)
+            for token in self._tokens(values)
+        )
+
+    def add(self, rownum, row):
+        for token in self.tokens(row):
+            insort(self.entries, (token, rownum))
+
+    def remove(self, rownum, row):
+        for token in self.tokens(row):
+            index = bisect_left(self.entries, (token, rownum))
+            if self.entries[index:index + 1] == [(token, rownum)]:
+                del self.entries[index]
+
+    def prefix(self, text):
+        """Get the set of row numbers with a word starting with text"""
+
+        text = text.casefold()
+        start = bisect_left(self.entries, (text,))
+        stop = bisect_left(self.entries, (text + self.end,), lo=start)
+        return {rownum for token, rownum in self.entries[start:stop]}
+
+    def search(self, text):
+        """Get the row numbers matching every word of the search text
+
+        Returns None if the text is blank, meaning no filter.
+        """
+
+        words = text.split()
+        if not words:
+            return None
+        # a phrase can match a full value, e.g. 'north se'
+        matches = self.prefix(text.strip())
+        if len(words) > 1:
+            every = self.prefix(words[0])
+            for word in words[1:]:
+                every &= self.prefix(word)
+            matches |= every
+        return matches
+
+
+class SuggestionIndex:
+    """Previously entered values of some fields, for autocompletion
+
+    Each field's distinct values are kept sorted by their case-folded form,
+    so the values starting with some text are found with two bisects. The
+    matches are ranked by how often the value was used, then how recently.
+    """
+
+    # matches above which suggest() walks the values in rank order instead
+    scan_limit = 2000
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.usage = {key: {} for key in fields}
+        self.entries = {key: [] for key in fields}
+        self._ranked = {}
+
+    def build(self, rows):
+        """Index the values of a sequence of rows, oldest first
+
+        Rows may also be a models.PipelineTable, which is read by column.
+        """
+
+        for key in self.fields:
+            if hasattr(rows, 'column'):
+                values = rows.column(key)
+            else:
+                values = [row.get(key) for row in rows]
+            usage = {}
+            for rownum, value in enumerate(values):
+                if value:
+                    count = usage.get(value, (0, 0))[0]
+                    usage[value] = (count + 1, rownum)
+            self.usage[key] = usage
+            self.entries[key] = sorted(
+                (value.casefold(), value) for value in usage)
+            self._ranked[key] = sorted(usage, key=self._rank(key))
+
+    def add(self, rownum, row):
+        """Index the values of a new or edited row"""
+
+        for key in self.fields:
+            value = row.get(key)
+            if not value:
+                continue
+            usage = self.usage[key]
+            if value not in usage:
+                insort(self.entries[key], (value.casefold(), value))
+            count, last = usage.get(value, (0, rownum))
+            usage[value] = (count + 1, max(last, rownum))
+            self._ranked.pop(key, None)
+
+    def remove(self, rownum, row):
+        """Forget the values of a row as it was before an edit
+
+        A value is dropped once no row uses it. Its most recent use isn't
+        recalculated, as that would need every row.
+        """
+
+        for key in self.fields:
+            value = row.get(key)
+            usage = self.usage[key]
+            if not value or value not in usage:
+                continue
+            count, last = usage[value]
+            if count > 1:
+                usage[value] = (count - 1, last)
+            else:
+                del usage[value]
+                entries = self.entries[key]
+                index = bisect_left(entries, (value.casefold(), value))
+                if entries[index:index + 1] == [(value.casefold(), value)]:
+                    del entries[index]
+            self._ranked.pop(key, None)
+
+    def _rank(self, key):
+        usage = self.usage[key]
+        return lambda value: (-usage[value][0], -usage[value][1])
+
+    def suggest(self, key, text, limit=10):
+        """Get up to limit values of key starting with text, best first"""
+
+        entries = self.entries.get(key, [])
+        text = text.casefold()
+        start = bisect_left(entries, (text,))
+        stop = bisect_left(entries, (text + PrefixIndex.end,), lo=start)
+        if stop - start <= self.scan_limit:
+            return heapq.nsmallest(
+                limit,
+                (value for folded, value in entries[start:stop]),
+                key=self._rank(key)
+            )
+
+        # a short prefix matching many values, so the best are found sooner
+        # by going through every value from the best down
+        if key not in self._ranked:
+            self._ranked[key] = sorted(self.usage[key], key=self._rank(key))
+        matches = (
+            value for value in self._ranked[key]
+            if value.casefold().startswith(text)
+        )
+        return list(islice(matches, limit))
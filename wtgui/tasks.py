@@ -0,0 +1,161 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Cancelled(Exception):
+    """Raised inside a background task when it has been cancelled"""
+
+
+class Task:
+    """A handle on a task submitted to a TaskRunner"""
+
+    def __init__(self, runner, description, on_done=None, on_error=None,
+                 previous_status='', cancellable=False):
+        self.runner = runner
+        self.description = description
+        self.on_done = on_done
+        self.on_error = on_error
+        # restored to the status bar when the task finishes
+        self.previous_status = previous_status
+        # only tasks that report progress, i.e. loads, can be cancelled;
+        # saves and other writes always run
+        self.cancellable = cancellable
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """Ask the task to stop at its next progress report"""
+
+        self.cancelled.set()
+
+    def progress(self, count):
+        """Report progress from the worker thread
+
+        Raises Cancelled if the task has been cancelled, which unwinds the
+        model call that reported it.
+        """
+
+        if self.cancelled.is_set():
+            raise Cancelled()
+        self.runner.queue.put((self, 'progress', count))
+
+
+class TaskRunner:
+    """Runs model calls off the Tk main thread
+
+    Calls run one at a time on a single worker thread, so the data model
+    is never used from two threads at once. Results come back through a
+    queue that is polled from the Tk mainloop with after(), and the
+    on_done/on_error callbacks always run on the main thread.
+    """
+
+    poll_interval = 50
+
+    def __init__(self, root, status):
+        """Constructor for TaskRunner
+
+        Args:
+          root - the Tk root window, used to poll and show busy state
+          status - a StringVar shown in the status bar
+        """
+        self.root = root
+        self.status = status
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.queue = queue.Queue()
+        self.tasks = []
+        self._poll_id = None
+
+    @property
+    def busy(self):
+        return len(self.tasks) > 0
+
+    def submit(self, func, *args, description='Working', on_done=None,
+               on_error=None, progress=False):
+        """Run func(*args) on the worker thread
+
+        With progress set, func is also passed a progress callback which
+        it should call periodically with a row count, and which raises
+        Cancelled when the user cancels the task. Tasks without progress
+        can't be cancelled, so a queued save is never dropped.
+        """
+
+        if self.busy:
+            previous_status = self.tasks[0].previous_status
+        else:
+            previous_status = self.status.get()
+        task = Task(self, description, on_done, on_error, previous_status,
+                    cancellable=progress)
+        kwargs = {'progress': task.progress} if progress else {}
+        self.tasks.append(task)
+        self.executor.submit(self._run, task, func, args, kwargs)
+
+        self.status.set(f'{description}…')
+        self.root.config(cursor='watch')
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+        return task
+
+    def _run(self, task, func, args, kwargs):
+        """Run a task on the worker thread and queue its outcome"""
+
+        try:
+            if task.cancelled.is_set():
+                raise Cancelled()
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.queue.put((task, 'error', e))
+        else:
+            self.queue.put((task, 'done', result))
+
+    def _poll(self):
+        """Deliver queued results on the main thread"""
+
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    task, kind, value = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._deliver(task, kind, value)
+        finally:
+            # keep polling even if a callback raised
+            if self.busy:
+                self._poll_id = self.root.after(self.poll_interval,
+                                                self._poll)
+            else:
+                self.root.config(cursor='')
+
+    def _deliver(self, task, kind, value):
+        if kind == 'progress':
+            self.status.set(f'{task.description}… {value} rows')
+            return
+
+        self.tasks.remove(task)
+        self.status.set(task.previous_status)
+        if kind == 'done':
+            if task.on_done:
+                task.on_done(value)
+        elif isinstance(value, Cancelled):
+            self.status.set(f'{task.description} cancelled')
+        elif task.on_error:
+            task.on_error(value)
+        else:
+            self.status.set(f'{task.description} failed: {value}')
+
+    def cancel(self):
+        """Cancel every pending task that can be cancelled"""
+
+        for task in self.tasks:
+            if task.cancellable:
+                task.cancel()
+
+    def shutdown(self):
+        """Cancel pending loads and stop the worker thread
+
+        Waits for the other pending tasks, such as saves, to finish. Their
+        outcomes aren't delivered, since the application is closing.
+        """
+
+        self.cancel()
+        self.executor.shutdown(wait=True)
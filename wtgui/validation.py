@@ -0,0 +1,311 @@
+import csv
+import math
+import re
+import sys
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from .constants import FieldTypes as FT
+
+
+# values of a cached field checked before the cache is cleared
+cache_size = 10000
+
+date_pattern = re.compile(r'\d{4}-\d{2}-\d{2}')
+bool_values = ('true', 'yes', '1', 'false', 'no', '0')
+
+
+def _places(increment):
+    """Get the number of decimal places allowed by an increment"""
+
+    exponent = Decimal(str(increment)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+def _check_number(spec, integer=False):
+    """Make a check function for a decimal or integer field"""
+
+    low = spec.get('min', -math.inf)
+    high = spec.get('max', math.inf)
+    places = 0 if integer else _places(spec.get('inc', '1.0'))
+
+    def check(text):
+        try:
+            value = float(text)
+        except ValueError:
+            return f'Invalid number string: {text}'
+        if not math.isfinite(value):
+            return f'Invalid number string: {text}'
+        if value < low:
+            return f'Value is too low (min {low})'
+        if value > high:
+            return f'Value is too high (max {high})'
+        if 'e' in text or 'E' in text:
+            exponent = Decimal(text).normalize().as_tuple().exponent
+            decimals = max(0, -exponent)
+        else:
+            decimals = len(text.partition('.')[2].rstrip('0'))
+        if decimals > places:
+            return f'Too many decimal places (max {places})'
+        return None
+
+    return check
+
+
+def _check_date(text):
+    if not date_pattern.fullmatch(text):
+        return 'Invalid date'
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        return 'Invalid date'
+    return None
+
+
+def _check_bool(text):
+    if text.lower() not in bool_values:
+        return f'Invalid boolean: {text}'
+    return None
+
+
+def _cached(check):
+    """Remember the results of check for values seen before
+
+    Dates and material properties repeat across most rows of a file, so
+    they only need checking once.
+    """
+
+    results = {}
+
+    def cached_check(text):
+        try:
+            return results[text]
+        except KeyError:
+            if len(results) >= cache_size:
+                results.clear()
+            result = results[text] = check(text)
+            return result
+
+    return cached_check
+
+
+def compile_field(spec, required=None):
+    """Compile a field spec into a function validating its text
+
+    The function takes the field's text and returns an error message, or
+    None if it's valid. Required overrides the spec's 'req' setting.
+    """
+
+    if required is None:
+        required = spec.get('req', False)
+    field_type = spec.get('type', FT.string)
+
+    if field_type == FT.decimal:
+        check = _check_number(spec)
+    elif field_type == FT.integer:
+        check = _check_number(spec, integer=True)
+    elif field_type == FT.iso_date_string:
+        check = _cached(_check_date)
+    elif field_type == FT.boolean:
+        check = _check_bool
+    elif field_type == FT.string_list and 'values' in spec:
+        values = set(spec['values'])
+
+        def check(text):
+            if text not in values:
+                return f'Not one of the allowed values: {text}'
+            return None
+    else:
+        check = None
+
+    if field_type in (FT.decimal, FT.integer):
+        check = _cached(check)
+
+    def validate(text):
+        if text is None:
+            text = ''
+        else:
+            text = str(text).strip()
+        if text == '':
+            return 'A value is required' if required else None
+        if check is None:
+            return None
+        return check(text)
+
+    return validate
+
+
+def compile_bulk(spec, validate):
+    """Compile a field spec into a function validating many values
+
+    The function takes a sequence of text values and returns a dict of the
+    bad ones to their error messages. It gives the same results as calling
+    validate on each value, but checks a column of numbers at once with a
+    single float conversion and regular expression match, only falling
+    back to validate if one of them fails.
+    """
+
+    field_type = spec.get('type', FT.string)
+
+    def check_each(values):
+        bad = {}
+        for value in set(values):
+            message = validate(value)
+            if message:
+                bad[value] = message
+        return bad
+
+    if field_type in (FT.string, FT.long_string):
+        if not spec.get('req', False):
+            return lambda values: {}
+
+        def check_values(values):
+            return check_each(
+                value for value in values if not value or value.isspace())
+        return check_values
+
+    if field_type not in (FT.decimal, FT.integer):
+        return check_each
+
+    low = spec.get('min', -math.inf)
+    high = spec.get('max', math.inf)
+    places = 0 if field_type == FT.integer else _places(spec.get('inc', 1))
+    # plain numbers with no more than the allowed decimal places, e.g.
+    # '12', '-0.5', '.25' or '3.250' for an increment of .01, one per line
+    if places:
+        fraction = r'\.\d{0,%d}0*' % places
+        leading = r'\.\d{1,%d}0*' % places
+    else:
+        fraction = r'\.0*'
+        leading = r'\.0+'
+    pattern = re.compile(
+        r'(?:[+-]?(?:\d+(?:%s)?|%s)\n)*' % (fraction, leading))
+
+    def check_values(values):
+        numbers = values
+        if '' in values:
+            numbers = [value for value in values if value]
+        try:
+            floats = list(map(float, numbers))
+        except ValueError:
+            return check_each(values)
+        if floats and (min(floats) < low or max(floats) > high):
+            return check_each(values)
+        if not pattern.fullmatch('\n'.join(numbers) + '\n' if numbers
+                                 else ''):
+            return check_each(values)
+        return check_each([''] if len(numbers) < len(values) else [])
+
+    return check_values
+
+
+class Validator:
+    """Validates pipelines against a dict of field specs
+
+    Each field's spec is compiled once into a validation function, see
+    compile_field.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.validators = {
+            key: compile_field(spec) for key, spec in fields.items()
+        }
+        self.bulk_validators = {
+            key: compile_bulk(spec, self.validators[key])
+            for key, spec in fields.items()
+        }
+
+    def get_errors(self, data):
+        """Get a dict of field names to error messages for a pipeline"""
+
+        errors = {}
+        for key, validate in self.validators.items():
+            message = validate(data.get(key))
+            if message:
+                errors[key] = message
+        return errors
+
+    def check(self, data, rownum=None):
+        """Raise a ValueError describing the first error in a pipeline"""
+
+        errors = self.get_errors(data)
+        if errors:
+            key, message = next(iter(errors.items()))
+            where = key if rownum is None else f'row {rownum}, {key}'
+            raise ValueError(f'Invalid {where}: {message}')
+
+    def validate_file(self, filename, chunksize=10000):
+        """Check every cell of a CSV file in one pass
+
+        Yields a (rownum, field, value, message) tuple for each bad cell,
+        with rows numbered from 0 like the data models. Raises an
+        exception if the header is missing fields. Compressed files are
+        read as in models.CSVModel.
+
+        The file is read in chunks of rows, each checked a column at a
+        time, see compile_bulk.
+        """
+
+        # imported here, as the models import this module
+        from .models import CSVModel
+
+        with CSVModel(filename).open_text() as fh:
+            csvreader = csv.reader(fh)
+            header = next(csvreader, None)
+            missing = set(self.fields) - set(header or [])
+            if missing:
+                raise Exception(
+                    "File is missing fields: {}"
+                    .format(', '.join(missing))
+                )
+            columns = [
+                (header.index(key), key, check_values)
+                for key, check_values in self.bulk_validators.items()
+            ]
+            # skip blank lines, as the data models do
+            records = (record for record in csvreader if record)
+            start = 0
+            while True:
+                chunk = list(islice(records, chunksize))
+                if not chunk:
+                    break
+                width = len(header)
+                if min(map(len, chunk)) < width:
+                    # short rows are missing their last values
+                    chunk = [
+                        record + [''] * (width - len(record))
+                        for record in chunk
+                    ]
+                transposed = list(zip(*chunk))
+                errors = []
+                for order, (position, key, check_values) in \
+                        enumerate(columns):
+                    values = transposed[position]
+                    bad = check_values(values)
+                    if bad:
+                        errors.extend(
+                            (rownum, order, key, value, bad[value])
+                            for rownum, value in enumerate(values, start)
+                            if value in bad
+                        )
+                for rownum, order, key, value, message in sorted(errors):
+                    yield rownum, key, value, message
+                start += len(chunk)
+
+
+def run_validate(filenames, fields, output=None):
+    """Check WTGUI-format CSV files, writing a line per bad cell
+
+    Returns the number of bad cells found.
+    """
+
+    output = output or sys.stdout
+    validator = Validator(fields)
+    count = 0
+    for filename in filenames:
+        for rownum, key, value, message in validator.validate_file(filename):
+            output.write(f'{filename}: row {rownum}, {key}: {message} '
+                         f'({value!r})\n')
+            count += 1
+    return count
@@ -1,13 +1,19 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from datetime import datetime
+from datetime import date, datetime
 from . import widgets as w
+from .constants import FieldTypes as FT
+from .profiling import traced
+from .search import PrefixIndex
 
 
 class InputDataForm(tk.Frame):
     """The input data form"""
 
+    # fields offering values from previous pipelines as you type
+    suggestion_fields = ('Project', 'Pipeline', 'Originator', 'Checker')
+
     def __init__(self, parent, fields, settings, callbacks, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.settings = settings
@@ -15,6 +21,9 @@ class InputDataForm(tk.Frame):
 
         self.current_pipeline = None
 
+        # a search.SuggestionIndex of the pipelines, see set_suggestions()
+        self.suggestions = None
+
         # a dict to keep track of input widgets
         self.inputs = {}
 
@@ -26,17 +35,20 @@ class InputDataForm(tk.Frame):
         generalinfo = tk.LabelFrame(self, text='General Information')
         self.inputs['Project'] = w.LabelInput(
             generalinfo, 'Project',
-            field_spec=fields['Project']
+            field_spec=fields['Project'],
+            **self._autocomplete('Project')
         )
         self.inputs['Project'].grid(row=0, column=0, columnspan=2)
         self.inputs['Pipeline'] = w.LabelInput(
             generalinfo, 'Pipeline',
-            field_spec=fields['Pipeline']
+            field_spec=fields['Pipeline'],
+            **self._autocomplete('Pipeline')
         )
         self.inputs['Pipeline'].grid(row=1, column=0, columnspan=2)
         self.inputs['Originator'] = w.LabelInput(
             generalinfo, 'Originator',
-            field_spec=fields['Originator']
+            field_spec=fields['Originator'],
+            **self._autocomplete('Originator')
         )
         self.inputs['Originator'].grid(row=2, column=0)
         self.inputs['Date'] = w.LabelInput(
@@ -46,7 +58,8 @@ class InputDataForm(tk.Frame):
         self.inputs['Date'].grid(row=2, column=1)
         self.inputs['Checker'] = w.LabelInput(
             generalinfo, 'Checker',
-            field_spec=fields['Checker']
+            field_spec=fields['Checker'],
+            **self._autocomplete('Checker')
         )
         self.inputs['Checker'].grid(row=3, column=0)
         self.inputs['CheckDate'] = w.LabelInput(
@@ -114,6 +127,24 @@ class InputDataForm(tk.Frame):
         # default the form
         self.reset()
 
+    def _autocomplete(self, key):
+        """Get the LabelInput arguments for a field with suggestions"""
+
+        def suggest(text):
+            if self.suggestions is None:
+                return []
+            return self.suggestions.suggest(key, text)
+
+        return {
+            'input_class': w.AutocompleteCombobox,
+            'input_args': {'suggest': suggest}
+        }
+
+    def set_suggestions(self, suggestions):
+        """Offer values from a search.SuggestionIndex as the user types"""
+
+        self.suggestions = suggestions
+
     def get(self):
         """Retrieve data from form as a dict"""
 
@@ -142,6 +173,7 @@ class InputDataForm(tk.Frame):
             self.inputs['E'].set(207)
             self.inputs['v'].set(0.3)
 
+    @traced
     def get_errors(self):
         """Get a list of field errors in the form"""
 
@@ -186,6 +218,19 @@ class MainMenu(tk.Menu):
         file_menu = tk.Menu(self, tearoff=False)
         file_menu.add_command(label="Select file…",
                               command=callbacks['file->select'])
+        file_menu.add_command(label="Open workspace…",
+                              command=callbacks['file->workspace'])
+        file_menu.add_command(label="Compact file",
+                              command=callbacks['file->compact'])
+        file_menu.add_command(label="Import CSV…",
+                              command=callbacks['file->import'])
+        file_menu.add_command(label="Export CSV…",
+                              command=callbacks['file->export'])
+        file_menu.add_command(label="Cancel loading",
+                              accelerator='Esc',
+                              command=callbacks['file->cancel'])
+        file_menu.add_command(label="Export timings…",
+                              command=callbacks['file->export_timings'])
         file_menu.add_separator()
         file_menu.add_command(label="Quit", command=callbacks['file->quit'])
         self.add_cascade(label='File', menu=file_menu)
@@ -200,6 +245,10 @@ class MainMenu(tk.Menu):
             label='Autofill Sheet Data',
             variable=settings['autofill sheet data']
         )
+        options_menu.add_checkbutton(
+            label='Record Timings',
+            variable=settings['record timings']
+        )
         self.add_cascade(label='Options', menu=options_menu)
 
         # the go menu to switch from pipelinelist to pipelineform
@@ -208,6 +257,8 @@ class MainMenu(tk.Menu):
                             command=callbacks['show_pipelinelist'])
         go_menu.add_command(label='New Pipeline',
                             command=callbacks['new_pipeline'])
+        go_menu.add_command(label='Parametric Sweep…',
+                            command=callbacks['show_sweep'])
         self.add_cascade(label='Go', menu=go_menu)
 
         # the help menu
@@ -229,22 +280,62 @@ class PipelineList(tk.Frame):
     """Display for CSV file contents"""
 
     column_defs = {
-        '#0': {'label': 'Row'},
-        'Date': {'label': 'Date'},
+        '#0': {'label': 'Row', 'type': FT.integer},
+        'Date': {'label': 'Date', 'type': FT.iso_date_string},
         'Pipeline': {'label': 'Pipeline', 'anchor': tk.W},
         'Originator': {'label': 'Originator'},
-        'D_o': {'label': 'Diameter [mm]'},
-        't_sel': {'label': 'Wall Thickness [mm]'}
+        'D_o': {'label': 'Diameter [mm]', 'type': FT.decimal},
+        't_sel': {'label': 'Wall Thickness [mm]', 'type': FT.decimal}
     }
     default_width = 100
     default_minwidth = 10
     default_anchor = tk.CENTER
+    default_rowheight = 20
+
+    # lists longer than this only keep the visible rows in the treeview
+    virtual_threshold = 1000
+    # extra rows rendered below the visible window in virtual mode
+    virtual_buffer = 5
+
+    # fields matched by the filter box, which is left out if empty
+    search_fields = ('Project', 'Pipeline', 'Originator')
 
     def __init__(self, parent, callbacks, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.callbacks = callbacks
         self.columnconfigure(0, weight=1)
-        self.rowconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        # the rows on display, and their row numbers in display order;
+        # in virtual mode only the view positions from self.first to
+        # self.first + self.visible_rows are in the treeview
+        self.rows = []
+        self.view = range(0)
+        self.virtual = False
+        self.first = 0
+        self.selected = None
+
+        # the sort order, and typed sort keys computed once per load
+        self.sort_column = None
+        self.sort_reverse = False
+        self._sort_keys = {}
+
+        # the row numbers matching the filter box, or None for all rows
+        self.index = None
+        self.matches = None
+        self.filter = tk.StringVar()
+        if self.search_fields:
+            filterframe = tk.Frame(self)
+            ttk.Label(filterframe, text='Filter').grid(row=0, column=0)
+            self.filterentry = ttk.Entry(filterframe,
+                                         textvariable=self.filter)
+            self.filterentry.grid(row=0, column=1, sticky=(tk.W + tk.E))
+            filterframe.columnconfigure(1, weight=1)
+            filterframe.grid(row=0, column=0, sticky=(tk.W + tk.E))
+            self.filter.trace('w', self.apply_filter)
+            for sequence in ('<Return>', '<Down>'):
+                self.filterentry.bind(
+                    sequence, lambda event: self.treeview.focus_set())
 
         # create treeview
         # note, #0 column is excluded as automatically created
@@ -263,9 +354,10 @@ class PipelineList(tk.Frame):
         )
         # connect treeview back to scrollbar
         self.treeview.configure(yscrollcommand=self.scrollbar.set)
-        self.treeview.grid(row=0, column=0, sticky='NSEW')
+        self.treeview.grid(row=1, column=0, sticky='NSEW')
+        self.visible_rows = int(self.treeview.cget('height'))
         # place scrollbar to right of treeview
-        self.scrollbar.grid(row=0, column=1, sticky='NSW')
+        self.scrollbar.grid(row=1, column=1, sticky='NSW')
 
         # configure treeview columns
         for name, definition in self.column_defs.items():
@@ -274,33 +366,558 @@ class PipelineList(tk.Frame):
             minwidth = definition.get('minwidth', self.default_minwidth)
             width = definition.get('width', self.default_width)
             stretch = definition.get('stretch', False)
-            self.treeview.heading(name, text=label, anchor=anchor)
+            self.treeview.heading(name, text=label, anchor=anchor,
+                                  command=lambda name=name: self.sort(name))
             self.treeview.column(name, anchor=anchor, minwidth=minwidth,
                                  width=width, stretch=stretch)
 
         # bind double click / enter event to open selected pipeline
         self.treeview.bind('<<TreeViewOpen>>', self.on_open_pipeline)
 
-    def populate(self, rows):
-        """Clear the treeview and write the supplied data rows to it"""
+        # in virtual mode, scrolling and keyboard navigation move the
+        # window of rows rather than the treeview's own view
+        self.treeview.bind('<Configure>', self._on_configure)
+        self.treeview.bind('<<TreeviewSelect>>', self._on_select)
+        self.treeview.bind('<MouseWheel>', self._on_mousewheel)
+        self.treeview.bind('<Button-4>', self._on_mousewheel)
+        self.treeview.bind('<Button-5>', self._on_mousewheel)
+        keys = {
+            '<Up>': -1,
+            '<Down>': 1,
+            '<Prior>': ('page', -1),
+            '<Next>': ('page', 1),
+            '<Home>': 'home',
+            '<End>': 'end'
+        }
+        for sequence, step in keys.items():
+            self.treeview.bind(
+                sequence,
+                lambda event, step=step: self._on_key(step)
+            )
+
+    def _values(self, rowdata):
+        valuekeys = list(self.column_defs.keys())[1:]
+        return [rowdata[key] for key in valuekeys]
+
+    def _insert(self, rownum):
+        self.treeview.insert('', 'end', iid=str(rownum), text=str(rownum),
+                             values=self._values(self.rows[rownum]))
+
+    @traced
+    def populate(self, rows, index=None):
+        """Clear the treeview and write the supplied data rows to it
+
+        Index is an optional search.PrefixIndex already built from the
+        rows; otherwise one is built the first time the filter is used.
+        """
 
         # empty data from treeview
-        for row in self.treeview.get_children():
-            self.treeview.delete(row)
+        children = self.treeview.get_children()
+        if children:
+            self.treeview.delete(*children)
+
+        self.rows = rows
+        self._sort_keys = {}
+        self.index = index
+        self._search()
+        self._build_view()
+        self.first = 0
+        self.selected = 0 if self.view else None
+        self._set_virtual(len(rows) > self.virtual_threshold)
 
         # populate the table
-        valuekeys = list(self.column_defs.keys())[1:]
-        for rownum, rowdata in enumerate(rows):
-            values = [rowdata[key] for key in valuekeys]
-            self.treeview.insert('', 'end', iid=str(rownum),
-                                 text=str(rownum), values=values)
+        if self.virtual:
+            self._render()
+        else:
+            for rownum in self.view:
+                self._insert(rownum)
 
         # set focus to first item in treeview
-        if len(rows) > 0:
+        if self.view:
+            first = str(self.view[0])
             self.treeview.focus_set()
-            self.treeview.selection_set(0)
-            self.treeview.focus('0')
+            self.treeview.selection_set(first)
+            self.treeview.focus(first)
+
+    @traced
+    def refresh(self, rows):
+        """Refresh the treeview with the supplied rows, writing only changes
+
+        Rows are matched to treeview items by row number. Changed rows are
+        updated, new rows appended, and surplus rows deleted in one call.
+        Rows may be a list of dicts or a models.PipelineTable.
+
+        Returns the numbers of the changed and added rows, or None if the
+        list was populated from scratch.
+        """
+
+        virtual = len(rows) > self.virtual_threshold
+        if virtual != self.virtual or not self.rows:
+            self.populate(rows)
+            return None
+
+        old_rows = self.rows
+        self.rows = rows
+        common = min(len(rows), len(old_rows))
+        if hasattr(rows, 'changed') and type(old_rows) is type(rows):
+            # a models.PipelineTable compares its columns directly
+            changed = rows.changed(old_rows)
+        else:
+            changed = [
+                rownum for rownum in range(common)
+                if old_rows[rownum] is not rows[rownum] and
+                old_rows[rownum] != rows[rownum]
+            ]
+        added = range(len(old_rows), len(rows))
+        surplus = range(len(rows), len(old_rows))
+        self._apply_changes(old_rows, changed, added, surplus)
+        return list(changed) + list(added)
+
+    @traced
+    def append(self, rows):
+        """Add rows to the end of the list
+
+        Used for rows appended to the file by someone else, which are
+        added to the list's own rows without reloading them.
+        """
+
+        if len(self.rows) + len(rows) > self.virtual_threshold \
+                and not self.virtual:
+            self.rows.extend(rows)
+            self.populate(self.rows)
+            return
+
+        start = len(self.rows)
+        self.rows.extend(rows)
+        self._apply_changes(self.rows, [], range(start, len(self.rows)),
+                            range(0))
+
+    def _apply_changes(self, old_rows, changed, added, surplus):
+        """Bring the treeview up to date with changes to self.rows"""
+
+        rows = self.rows
+
+        # keep the cached sort keys and search index in step with the rows
+        if surplus:
+            self._sort_keys = {}
+            self.index = None
+        if self.index is not None:
+            for rownum in changed:
+                self.index.remove(rownum, old_rows[rownum])
+                self.index.add(rownum, rows[rownum])
+            for rownum in added:
+                self.index.add(rownum, rows[rownum])
+        for column, keys in self._sort_keys.items():
+            key = self._key_function(column)
+            for rownum in changed:
+                keys[rownum] = key(rows[rownum][column])
+            keys.extend(key(rows[rownum][column]) for rownum in added)
+
+        selected = self._selected_rownum()
+        self._search()
+        self._build_view()
+
+        if self.virtual:
+            self.selected = self._position(selected)
+            self._render()
+            return
+
+        # drop removed and filtered out rows, then add any newly shown
+        wanted = {str(rownum) for rownum in self.view}
+        shown = set(self.treeview.get_children())
+        if shown - wanted:
+            self.treeview.delete(*(shown - wanted))
+        for rownum in changed:
+            if str(rownum) in shown & wanted:
+                self.treeview.item(str(rownum),
+                                   values=self._values(rows[rownum]))
+        for rownum in self.view:
+            if str(rownum) not in shown:
+                self._insert(rownum)
+        # new rows are added at the end, which is only out of order in a
+        # sorted or filtered view
+        if self.sort_column is not None or self.matches is not None:
+            self._move_items()
+
+    def _search(self):
+        """Find the rows matching the filter box"""
+
+        text = self.filter.get()
+        if not text.strip():
+            self.matches = None
+            return
+        if self.index is None:
+            self.index = PrefixIndex(self.search_fields)
+            self.index.build(self.rows)
+        self.matches = self.index.search(text)
+
+    @traced
+    def apply_filter(self, *args):
+        """Show only the rows matching the filter box"""
+
+        selected = self._selected_rownum()
+        self._search()
+        self._build_view()
+        self.selected = self._position(selected)
+        if self.virtual:
+            self.first = 0
+            if self.selected is not None:
+                self.first = max(0, self.selected - self.visible_rows // 2)
+            self.first = max(0, min(self.first,
+                                    len(self.view) - self.visible_rows))
+            self._render()
+            return
+
+        children = self.treeview.get_children()
+        if children:
+            self.treeview.delete(*children)
+        for rownum in self.view:
+            self._insert(rownum)
+        if self.selected is not None:
+            iid = str(self.view[self.selected])
+            self.treeview.selection_set(iid)
+            self.treeview.focus(iid)
+
+    def _selected_rownum(self):
+        if self.selected is None or self.selected >= len(self.view):
+            return None
+        return self.view[self.selected]
+
+    def _position(self, rownum):
+        """Get the view position of a row number, or None"""
+
+        if rownum is None or rownum >= len(self.rows):
+            return 0 if self.view else None
+        try:
+            return self.view.index(rownum)
+        except ValueError:
+            # filtered out
+            return 0 if self.view else None
+
+    def _key_function(self, column):
+        """Get a function converting a column's values to sort keys"""
+
+        field_type = self.column_defs[column].get('type', FT.string)
+        if field_type in (FT.decimal, FT.integer):
+            def key(value):
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    return float('-inf')
+        elif field_type == FT.iso_date_string:
+            def key(value):
+                try:
+                    return date.fromisoformat(str(value))
+                except ValueError:
+                    return date.min
+        else:
+            def key(value):
+                return str(value).casefold()
+        return key
+
+    def _sort_key(self, column):
+        """Get the sort keys of a column, computing them if needed"""
+
+        if column not in self._sort_keys:
+            key = self._key_function(column)
+            if hasattr(self.rows, 'column'):
+                values = self.rows.column(column)
+            else:
+                values = (rowdata[column] for rowdata in self.rows)
+            self._sort_keys[column] = [key(value) for value in values]
+        return self._sort_keys[column]
+
+    def _build_view(self):
+        """Work out the display order of the rows"""
+
+        if self.matches is None:
+            rownums = range(len(self.rows))
+        else:
+            rownums = sorted(self.matches)
+
+        if self.sort_column in (None, '#0'):
+            if self.sort_reverse and self.sort_column:
+                self.view = rownums[::-1]
+            else:
+                self.view = rownums
+        else:
+            keys = self._sort_key(self.sort_column)
+            self.view = sorted(rownums, key=keys.__getitem__,
+                               reverse=self.sort_reverse)
+
+    def _move_items(self):
+        """Put the treeview's items in view order
+
+        Only the items from the first one out of place onwards are moved.
+        """
+
+        items = self.treeview.get_children()
+        wanted = [str(rownum) for rownum in self.view]
+        start = 0
+        for start, (item, want) in enumerate(zip(items, wanted)):
+            if item != want:
+                break
+        else:
+            start = min(len(items), len(wanted))
+        for index in range(start, len(wanted)):
+            self.treeview.move(wanted[index], '', index)
+
+    @traced
+    def sort(self, column):
+        """Sort the rows by a column, reversing the order if already sorted"""
+
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+
+        for name, definition in self.column_defs.items():
+            label = definition.get('label', '')
+            if name == column:
+                label += ' ▼' if self.sort_reverse else ' ▲'
+            self.treeview.heading(name, text=label)
+
+        selected = self._selected_rownum()
+        self._build_view()
+        self.selected = self._position(selected)
+        if self.virtual:
+            if self.selected is not None:
+                self.first = max(0, self.selected - self.visible_rows // 2)
+            self.first = max(0, min(self.first,
+                                    len(self.view) - self.visible_rows))
+            self._render()
+        else:
+            self._move_items()
+
+    def _set_virtual(self, virtual):
+        """Switch the scrollbar between the treeview and the row window"""
+
+        self.virtual = virtual
+        if virtual:
+            self.scrollbar.configure(command=self._on_scrollbar)
+            self.treeview.configure(yscrollcommand='')
+        else:
+            self.scrollbar.configure(command=self.treeview.yview)
+            self.treeview.configure(yscrollcommand=self.scrollbar.set)
+
+    def _render(self):
+        """Put the current window of rows into the treeview"""
+
+        children = self.treeview.get_children()
+        if children:
+            self.treeview.delete(*children)
+
+        last = min(self.first + self.visible_rows + self.virtual_buffer,
+                   len(self.view))
+        for position in range(self.first, last):
+            self._insert(self.view[position])
+        self.treeview.yview_moveto(0)
+
+        if self.selected is not None and self.first <= self.selected < last:
+            iid = str(self.view[self.selected])
+            self.treeview.selection_set(iid)
+            self.treeview.focus(iid)
+
+        if self.view:
+            total = len(self.view)
+            self.scrollbar.set(
+                self.first / total,
+                min(self.first + self.visible_rows, total) / total
+            )
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, first):
+        """Move the window of rows to start at the given view position"""
+
+        first = max(0, min(first, len(self.view) - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            self._render()
+
+    def _on_scrollbar(self, action, number, what=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(number) * len(self.view)))
+        elif action == 'scroll':
+            step = self.visible_rows if what == 'pages' else 1
+            self.scroll_to(self.first + int(number) * step)
+
+    def _on_mousewheel(self, event):
+        if not self.virtual:
+            return
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+        return 'break'
+
+    def _on_configure(self, event):
+        """Work out how many rows fit in the treeview"""
+
+        rowheight = ttk.Style().lookup('Treeview', 'rowheight')
+        rowheight = int(rowheight or self.default_rowheight)
+        # the first row starts below the headings
+        children = self.treeview.get_children()
+        bbox = self.treeview.bbox(children[0]) if children else None
+        top = bbox[1] if bbox else rowheight
+        self.visible_rows = max(1, (event.height - top) // rowheight)
+        if self.virtual:
+            self._render()
+
+    def _on_select(self, *args):
+        selection = self.treeview.selection()
+        if selection and self.virtual:
+            self.selected = self.first + self.treeview.index(selection[0])
+
+    def _on_key(self, step):
+        """Move the selection, scrolling the window of rows as needed"""
+
+        if not self.virtual:
+            return
+        last = len(self.view) - 1
+        current = self.first if self.selected is None else self.selected
+        if step == 'home':
+            target = 0
+        elif step == 'end':
+            target = last
+        elif isinstance(step, tuple):
+            target = current + step[1] * self.visible_rows
+        else:
+            target = current + step
+        target = max(0, min(target, last))
+
+        self.selected = target
+        if target < self.first:
+            self.scroll_to(target)
+        elif target >= self.first + self.visible_rows:
+            self.scroll_to(target - self.visible_rows + 1)
+        iid = str(self.view[target])
+        self.treeview.selection_set(iid)
+        self.treeview.focus(iid)
+        return 'break'
 
     def on_open_pipeline(self, *args):
         selected_id = self.treeview.selection()[0]
         self.callbacks['on_open_pipeline'](selected_id)
+
+
+class SweepResultList(PipelineList):
+    """Display for the results of a parametric sweep"""
+
+    column_defs = {
+        '#0': {'label': 'Row', 'type': FT.integer},
+        'D_o': {'label': 'Diameter [mm]', 'type': FT.decimal},
+        'p': {'label': 'Pressure [MPa]', 'type': FT.decimal},
+        'SMYS': {'label': 'SMYS [MPa]', 'type': FT.decimal},
+        't_sel': {'label': 'Wall Thickness [mm]', 'type': FT.decimal},
+        't_req': {'label': 'Required [mm]', 'type': FT.decimal},
+        'util': {'label': 'Utilisation [-]', 'type': FT.decimal}
+    }
+
+    # sweep points have no text fields to filter on
+    search_fields = ()
+
+    def _values(self, rowdata):
+        values = []
+        for key in list(self.column_defs.keys())[1:]:
+            value = rowdata.get(key, '')
+            if isinstance(value, float):
+                # NaN, e.g. utilisation without a selected wall thickness
+                value = '' if value != value else f'{value:.3f}'
+            values.append(value)
+        return values
+
+    def on_open_pipeline(self, *args):
+        pass
+
+
+class SweepForm(tk.Toplevel):
+    """A dialog to run the calculation over ranges of the numeric inputs"""
+
+    def __init__(self, parent, fields, base, callbacks, *args, **kwargs):
+        """Constructor for SweepForm
+
+        Args:
+          parent - The parent widget
+          fields - the data model's field definitions
+          base - a dict of the input data form's values, used as defaults
+          callbacks - a dict containing Python callables
+        """
+        super().__init__(parent, *args, **kwargs)
+        self.title('Parametric Sweep')
+        self.callbacks = callbacks
+        self.result = None
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        # a (from, to, steps) tuple of variables per input
+        self.ranges = {}
+        names = {'p': 'Design Pressure [MPa]'}
+        for key, spec in fields.items():
+            if spec['type'] in (FT.decimal, FT.integer):
+                names[key] = key
+
+        rangesframe = tk.LabelFrame(self, text='Ranges')
+        for column, heading in enumerate(('', 'From', 'To', 'Steps')):
+            ttk.Label(rangesframe, text=heading).grid(row=0, column=column)
+        for row, (key, label) in enumerate(names.items(), start=1):
+            variables = (
+                tk.StringVar(value=base.get(key, '')),
+                tk.StringVar(),
+                tk.StringVar(value='1')
+            )
+            ttk.Label(rangesframe, text=label).grid(
+                row=row, column=0, sticky=tk.W)
+            for column, variable in enumerate(variables, start=1):
+                ttk.Entry(rangesframe, textvariable=variable, width=10).grid(
+                    row=row, column=column)
+            self.ranges[key] = variables
+        rangesframe.grid(row=0, column=0, sticky=(tk.W + tk.E), padx=10)
+
+        self.resultlist = SweepResultList(self, {})
+        self.resultlist.grid(row=1, column=0, sticky='NSEW', padx=10)
+
+        buttons = tk.Frame(self)
+        ttk.Button(
+            buttons, text='Run',
+            command=lambda: self.callbacks['on_sweep'](self)
+        ).grid(row=0, column=0)
+        self.exportbutton = ttk.Button(
+            buttons, text='Export…', state=tk.DISABLED,
+            command=lambda: self.callbacks['on_sweep_export'](self.result)
+        )
+        self.exportbutton.grid(row=0, column=1)
+        buttons.grid(row=2, column=0, sticky=tk.E, padx=10, pady=5)
+
+    def get(self):
+        """Get the sweep ranges as a dict of values or lists of values
+
+        Inputs left blank are omitted. Raises ValueError for entries that
+        aren't numbers.
+        """
+
+        ranges = {}
+        for key, (from_var, to_var, steps_var) in self.ranges.items():
+            start = from_var.get().strip()
+            stop = to_var.get().strip()
+            steps = int(steps_var.get() or 1)
+            if not start:
+                continue
+            start = float(start)
+            if not stop or steps <= 1:
+                ranges[key] = start
+            else:
+                stop = float(stop)
+                ranges[key] = [
+                    start + (stop - start) * step / (steps - 1)
+                    for step in range(steps)
+                ]
+        return ranges
+
+    def show_results(self, result):
+        """Show a SweepResult in the results table"""
+
+        self.result = result
+        self.resultlist.populate(result)
+        self.exportbutton.config(state=tk.NORMAL)
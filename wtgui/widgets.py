@@ -3,13 +3,20 @@ from tkinter import ttk
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from .constants import FieldTypes as FT
+from .validation import compile_field
 
 
 class ValidatedMixin:
-    """Adds a validation functionality to an input widget"""
+    """Adds a validation functionality to an input widget
 
-    def __init__(self, *args, error_var=None, **kwargs):
+    If given, validator is a function taking the widget's text and
+    returning an error message or None, see validation.compile_field. It
+    replaces the widget's own focus out validation.
+    """
+
+    def __init__(self, *args, error_var=None, validator=None, **kwargs):
         self.error = error_var or tk.StringVar()
+        self.validator = validator
         super().__init__(*args, **kwargs)
 
         vcmd = self.register(self._validate)
@@ -32,7 +39,12 @@ class ValidatedMixin:
         self._toggle_error(False)
         self.error.set('')
         valid = True
-        if event == 'focusout':
+        if event == 'focusout' and self.validator:
+            message = self.validator(self.get())
+            if message:
+                self.error.set(message)
+                valid = False
+        elif event == 'focusout':
             valid = self._focusout_validate(event=event)
         elif event == 'key':
             valid = self._key_validate(
@@ -153,6 +165,30 @@ class ValidatedCombobox(ValidatedMixin, ttk.Combobox):
         return valid
 
 
+class AutocompleteCombobox(ValidatedMixin, ttk.Combobox):
+    """A required combobox offering previously entered values
+
+    Suggest is a function taking the text typed so far and returning the
+    values to list, best first. Values not in the list are allowed.
+    """
+
+    def __init__(self, *args, suggest=None, **kwargs):
+        self.suggest = suggest
+        super().__init__(*args, **kwargs)
+
+    def _key_validate(self, proposed, **kwargs):
+        if self.suggest:
+            self.config(values=self.suggest(proposed))
+        return True
+
+    def _focusout_validate(self, **kwargs):
+        valid = True
+        if not self.get():
+            valid = False
+            self.error.set('A value is required')
+        return valid
+
+
 class ValidatedSpinbox(ValidatedMixin, tk.Spinbox):
 
     def __init__(self, *args, min_var=None, max_var=None,
@@ -295,6 +331,10 @@ class LabelInput(tk.Frame):
             # values
             if 'values' in field_spec and 'values' not in input_args:
                 input_args['values'] = field_spec.get('values')
+            # the same checks as the headless validator
+            if (issubclass(input_class, ValidatedMixin) and
+                    'validator' not in input_args):
+                input_args['validator'] = compile_field(field_spec)
         else:
             self.variable = input_var
 